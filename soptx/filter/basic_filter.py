@@ -12,13 +12,15 @@ from soptx.utils import timer
 class BasicFilter(ABC):
     """基础滤波器抽象基类"""
     
-    def __init__(self, mesh: StructuredMesh, rmin: float, domain: List):
+    def __init__(self, mesh: StructuredMesh, rmin: float, domain: List,
+                filter_operator: Optional[Tuple[CSRTensor, TensorLike]] = None):
         """
         Parameters:
         -----------
         mesh : 网格
         rmin : 滤波半径 (物理距离)
         domain : 计算域的边界
+        filter_operator : 已构建好的 (H, Hs), 提供时直接复用, 不再重新计算滤波矩阵
         """
         if rmin <= 0:
             raise ValueError("Filter radius must be positive")
@@ -28,7 +30,11 @@ class BasicFilter(ABC):
         self.domain = domain
         self.device = mesh.device
         
-        self._H, self._Hs = self._compute_filter_matrix()
+        if filter_operator is None:
+            self._H, self._Hs = self._compute_filter_matrix()
+        else:
+            H, Hs = filter_operator
+            self._H, self._Hs = H.device_put(self.device), bm.device_put(Hs, self.device)
         self._cell_measure = self.mesh.entity_measure('cell')
         self._normalize_factor = self._H.matmul(self._cell_measure)
 
@@ -101,56 +107,35 @@ class BasicFilter(ABC):
 
         # 计算节点总数
         NC = cell_centers.shape[0]
+        kwargs = bm.context(cell_centers)
         
-        # 准备存储过滤器矩阵的数组
-        # 预估非零元素的数量（包括对角线元素）
-        max_nnz = len(cell_indices) + NC
-        iH = bm.zeros(max_nnz, dtype=bm.int32)
-        jH = bm.zeros(max_nnz, dtype=bm.int32)
-        sH = bm.zeros(max_nnz, dtype=bm.float64)
-        
-        # 首先添加对角线元素（自身单元）
-        for i in range(NC):
-            iH[i] = i
-            jH[i] = i
-            # 自身权重为 rmin（最大权重）
-            sH[i] = rmin
-        
-        # 当前非零元素计数
-        nnz = NC
-        
-        # 填充其余非零元素（邻居点）
-        for idx in range(len(cell_indices)):
-            i = cell_indices[idx]
-            j = neighbor_indices[idx]
-            
-            # 计算节点间的物理距离
-            physical_dist = bm.sqrt(bm.sum((cell_centers[i] - cell_centers[j])**2))
-            
-            # 计算权重因子
-            fac = rmin - physical_dist
-            
-            if fac > 0:
-                iH[nnz] = i
-                jH[nnz] = j
-                sH[nnz] = fac
-                nnz += 1
+        # 一次性计算所有邻居对的物理距离和权重因子
+        physical_dist = bm.sqrt(bm.sum((cell_centers[cell_indices] - cell_centers[neighbor_indices])**2, axis=-1))
+        fac = rmin - physical_dist
+        mask = fac > 0
+
+        # 对角线元素（自身单元）的权重为 rmin（最大权重）
+        diag = bm.arange(NC, dtype=bm.int32, device=bm.get_device(cell_centers))
+        iH = bm.concat([diag, bm.astype(cell_indices[mask], bm.int32)])
+        jH = bm.concat([diag, bm.astype(neighbor_indices[mask], bm.int32)])
+        sH = bm.concat([bm.full((NC, ), rmin, **kwargs), fac[mask]])
 
         if enable_timing:
-            t.send('循环计算时间')
+            t.send('权重计算时间')
         
-        # 创建稀疏矩阵（只使用有效的非零元素）
+        # 创建稀疏矩阵
         H = COOTensor(
-            indices=bm.astype(bm.stack((iH[:nnz], jH[:nnz]), axis=0), bm.int32),
-            values=sH[:nnz],
+            indices=bm.stack((iH, jH), axis=0),
+            values=sH,
             spshape=(NC, NC)
         )
         
         # 转换为 CSR 格式以便于后续操作
         H = H.tocsr()
+        H = H.device_put(self.device)
         
         # 计算滤波矩阵行和
-        Hs = H @ bm.ones(H.shape[1], dtype=bm.float64)
+        Hs = H @ bm.ones(H.shape[1], dtype=bm.float64, device=self.device)
 
         if enable_timing:
             t.send('稀疏矩阵构建时间')
@@ -606,8 +591,9 @@ class BasicFilter(ABC):
 
 class SensitivityBasicFilter(BasicFilter):
     """灵敏度滤波器"""
-    def __init__(self, mesh: StructuredMesh, rmin: float, domain: List):
-        super().__init__(mesh, rmin, domain=domain)
+    def __init__(self, mesh: StructuredMesh, rmin: float, domain: List,
+                filter_operator: Optional[Tuple[CSRTensor, TensorLike]] = None):
+        super().__init__(mesh, rmin, domain=domain, filter_operator=filter_operator)
     
     def get_initial_density(self, x: TensorLike, xPhys: TensorLike) -> None:
         """灵敏度滤波器的初始物理密度等于设计变量"""
@@ -621,15 +607,12 @@ class SensitivityBasicFilter(BasicFilter):
         return xPhys
 
     def filter_objective_sensitivities(self, xPhys: TensorLike, dobj: TensorLike) -> None:
-        # 计算密度加权的目标函数灵敏度
-        weighted_dobj = bm.einsum('c, c -> c', xPhys, dobj)
-        # 应用滤波矩阵
-        filtered_dobj = self._H.matmul(weighted_dobj)
-        # 计算修正因子
-        correction_factor = self._Hs * bm.maximum(bm.tensor(0.001, dtype=bm.float64), xPhys)
+        # 密度加权后应用滤波矩阵, 再除以修正因子 Hs * max(0.001, xPhys);
+        # 下界用 clip 表达, 不再为 0.001 单独创建 (主机上的) 张量
+        filtered_dobj = self._H.matmul(xPhys * dobj) / (self._Hs * bm.clip(xPhys, 0.001, None))
         # 过滤后的目标函数灵敏度
-        # dobj[:] = filtered_dobj / correction_factor
-        dobj = bm.set_at(dobj, slice(None), filtered_dobj / correction_factor)
+        # dobj[:] = filtered_dobj
+        dobj = bm.set_at(dobj, slice(None), filtered_dobj)
         return dobj
 
     def filter_constraint_sensitivities(self, xPhys: TensorLike, dcons: TensorLike) -> None:
@@ -637,8 +620,9 @@ class SensitivityBasicFilter(BasicFilter):
 
 class DensityBasicFilter(BasicFilter):
     """密度滤波器"""
-    def __init__(self, mesh: StructuredMesh, rmin: float, domain: List):
-        super().__init__(mesh, rmin, domain=domain)
+    def __init__(self, mesh: StructuredMesh, rmin: float, domain: List,
+                filter_operator: Optional[Tuple[CSRTensor, TensorLike]] = None):
+        super().__init__(mesh, rmin, domain=domain, filter_operator=filter_operator)
     
     def get_initial_density(self, x: TensorLike, xPhys: TensorLike) -> None:
         """密度滤波器的初始物理密度等于设计变量"""
@@ -679,14 +663,19 @@ class DensityBasicFilter(BasicFilter):
 class HeavisideProjectionBasicFilter(BasicFilter):
     """Heaviside 投影滤波器"""
     def __init__(self, mesh: StructuredMesh, rmin: float, domain: List,
-                beta: float = 1.0, max_beta: float = 512, continuation_iter: int = 50):
+                beta: float = 1.0, max_beta: float = 512, continuation_iter: int = 50,
+                filter_operator: Optional[Tuple[CSRTensor, TensorLike]] = None,
+                beta_schedule: Optional[TensorLike] = None):
         """
         Parameters
         - mesh : 均匀网格
         - rmin : 滤波半径 (物理距离)
         - beta : Heaviside 投影参数
+        - filter_operator : 已构建好的 (H, Hs), 提供时直接复用
+        - beta_schedule : 预先计算的每次迭代的 beta 值 (max_iterations, ),
+            提供时 continuation 按该序列取值, 忽略 beta, max_beta 和 continuation_iter
         """
-        super().__init__(mesh, rmin, domain=domain)
+        super().__init__(mesh, rmin, domain=domain, filter_operator=filter_operator)
         if beta <= 0:
             raise ValueError("Heaviside beta must be positive")
             
@@ -697,6 +686,17 @@ class HeavisideProjectionBasicFilter(BasicFilter):
 
         self._beta_iter = 0  # 用于追踪 continuation 的内部状态
 
+        self._beta_schedule = None
+        if beta_schedule is not None:
+            self._beta_schedule = bm.device_put(beta_schedule, mesh.device)
+            self.beta = self._beta_schedule[0]
+            # beta 发生变化的迭代步在主机端预先确定, 迭代中只需索引取值
+            beta_host = bm.to_numpy(beta_schedule).tolist()
+            self._beta_steps = {i: beta_host[i] for i in range(1, len(beta_host))
+                                if beta_host[i] != beta_host[i-1]}
+            # 最后一次 beta 变化之前, continuation 尚未完成, 不允许判定收敛
+            self._last_beta_step = max(self._beta_steps, default=0)
+
     def get_initial_density(self, x: TensorLike, xPhys: TensorLike) -> None:
         """Heaviside 投影滤波器的初始物理密度需要投影"""
         self._xTilde = x 
@@ -738,18 +738,33 @@ class HeavisideProjectionBasicFilter(BasicFilter):
         return dcons
 
 
-    def continuation_step(self, change: float) -> Tuple[float, bool]:
+    def continuation_step(self, change: float,
+                        iter_idx: Optional[int] = None) -> Tuple[float, bool]:
         """
         执行一步 beta continuation
         
         Parameters
         - change : 当前的收敛变化量
+        - iter_idx : 当前的迭代编号, 使用 beta_schedule 时必须提供
         
         Returns
         - new_change : 更新后的收敛变化量
         - continued : 是否执行了 continuation
 
         """
+        if self._beta_schedule is not None:
+            if iter_idx is None:
+                raise ValueError("iter_idx is required when beta_schedule is set")
+            # 下一次迭代使用的 beta, 按迭代编号索引, 断点续算时与序列保持一致
+            next_iter = iter_idx + 1
+            idx = min(next_iter, self._beta_schedule.shape[0] - 1)
+            self.beta = self._beta_schedule[idx]
+            if next_iter in self._beta_steps:
+                print(f"Beta increased to {self._beta_steps[next_iter]}")
+                return 1.0, True
+            # 序列中的 beta 尚未达到最终值时, 阻止收敛判定
+            return change, next_iter < self._last_beta_step
+
         self._beta_iter += 1
         
         if (self.beta < self.max_beta and 
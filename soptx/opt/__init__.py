@@ -5,7 +5,7 @@ from .oc import OCOptimizer
 from .mma import MMAOptimizer
 from .amr_handler import AMRHandler
 from .utils import solve_mma_subproblem
-from .tools import OptimizationHistory, save_optimization_history, plot_optimization_history
+from .tools import OptimizationHistory, save_optimization_history, save_density, plot_optimization_history
 
 __all__ = [
     'ObjectiveBase',
@@ -21,5 +21,6 @@ __all__ = [
     'solve_mma_subproblem',
     'OptimizationHistory',
     'save_optimization_history',
+    'save_density',
     'plot_optimization_history',
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, Callable
 from time import time
 from dataclasses import dataclass
 import warnings
@@ -63,6 +63,26 @@ class MMAOptions:
         """0.5*d_i*(y_i)**2 项的二次项系数 d_i"""
         return self._d
 
+    @property
+    def history_buffer(self) -> Optional[TensorLike]:
+        """预分配的密度历史缓冲区 (max_iterations, NC)"""
+        return self._history_buffer
+
+    @property
+    def history_scalars(self) -> Optional[TensorLike]:
+        """预分配的标量历史缓冲区 (max_iterations, 4)"""
+        return self._history_scalars
+
+    @property
+    def history_callback(self) -> Optional[Callable[[int, TensorLike, TensorLike, OptimizationHistory], Any]]:
+        """每次迭代记录历史后的回调 (iter_idx, density, rho, history)"""
+        return self._history_callback
+
+    @property
+    def start_iter(self) -> int:
+        """起始迭代编号, 大于 0 时从断点续算"""
+        return self._start_iter
+
     def __init__(self):
         """初始化高级参数的默认值"""
         self._m = 1
@@ -73,6 +93,10 @@ class MMAOptions:
         self._a = None
         self._c = None
         self._d = None
+        self._history_buffer = None
+        self._history_scalars = None
+        self._history_callback = None
+        self._start_iter = 0
 
     def set_advanced_options(self, **kwargs):
         """设置高级选项，仅供专业用户使用
@@ -87,6 +111,13 @@ class MMAOptions:
             - a : a_i*z 项的线性系数
             - c : c_i*y_i 项的线性系数
             - d : 0.5*d_i*(y_i)**2 项的二次项系数
+            - history_buffer : 预分配的密度历史缓冲区 (max_iterations, NC)
+            - history_scalars : 预分配的标量历史缓冲区 (max_iterations, 4)
+            - history_callback : 每次迭代记录历史后的回调 (iter_idx, density, rho, history),
+                density 为物理密度的快照, rho 为设计变量, history 为当前的历史记录;
+                缓冲区在 jax 等后端上写入时会被替换, 需通过 history 访问最新的缓冲区
+            - start_iter : 起始迭代编号, 大于 0 时从断点续算,
+                此前的历史记录从 history_buffer 和 history_scalars 中恢复
         """
         warnings.warn("Modifying advanced options may affect algorithm stability",
                      UserWarning)
@@ -99,7 +130,11 @@ class MMAOptions:
                         'a0': '_a0',
                         'a': '_a',
                         'c': '_c',
-                        'd': '_d'
+                        'd': '_d',
+                        'history_buffer': '_history_buffer',
+                        'history_scalars': '_history_scalars',
+                        'history_callback': '_history_callback',
+                        'start_iter': '_start_iter'
                     }
         
         for key, value in kwargs.items():
@@ -111,12 +146,14 @@ class MMAOptions:
         # 如果设置了 m，且相关参数为 None，则初始化它们
         if 'm' in kwargs:
             m = kwargs['m']
+            # 与设计变量边界放在同一设备上, 避免迭代中的设备间拷贝
+            device = bm.get_device(self._xmin) if self._xmin is not None else None
             if self._a is None:
-                self._a = bm.zeros((m, 1))
+                self._a = bm.zeros((m, 1), dtype=bm.float64, device=device)
             if self._c is None:
-                self._c = 1e4 * bm.ones((m, 1))
+                self._c = bm.full((m, 1), 1e4, dtype=bm.float64, device=device)
             if self._d is None:
-                self._d = bm.zeros((m, 1))
+                self._d = bm.zeros((m, 1), dtype=bm.float64, device=device)
 
 class MMAOptimizer(OptimizerBase):
     """Method of Moving Asymptotes (MMA) 优化器
@@ -159,14 +196,19 @@ class MMAOptimizer(OptimizerBase):
 
         # 设置依赖于问题规模的参数（仅当它们尚未设置时）
         n = filter.mesh.number_of_cells()
+        device = filter.mesh.device
         advanced_params = {}
         
         if self.options.n is None:
             advanced_params['n'] = n
+        if self.options.xmin is None or self.options.xmax is None:
+            # 上下界共用一块 (n, 2) 的缓冲区
+            xbounds = bm.stack([bm.zeros(n, dtype=bm.float64, device=device), 
+                                bm.ones(n, dtype=bm.float64, device=device)], axis=1)
         if self.options.xmin is None:
-            advanced_params['xmin'] = bm.zeros((n, 1))
+            advanced_params['xmin'] = xbounds[:, 0:1]
         if self.options.xmax is None:
-            advanced_params['xmax'] = bm.ones((n, 1))
+            advanced_params['xmax'] = xbounds[:, 1:2]
             
         if advanced_params:  # 只有当有参数需要设置时才调用
             self.options.set_advanced_options(**advanced_params)
@@ -192,7 +234,7 @@ class MMAOptimizer(OptimizerBase):
             self._low = xval - asyinit * xmami
             self._upp = xval + asyinit * xmami
         else:
-            factor = bm.ones((xval.shape[0], 1))
+            factor = bm.ones((xval.shape[0], 1), **bm.context(xval))
             xxx = (xval - xold1) * (xold1 - xold2)
             epsilon = 1e-12
             factor[xxx > epsilon] = asyincr
@@ -249,8 +291,9 @@ class MMAOptimizer(OptimizerBase):
         raa0 = self._RAA0       # 1e-5   
         epsimin = self._EPSILON_MIN
 
-        eeen = bm.ones((n, 1), dtype=bm.float64) # (n, 1)
-        eeem = bm.ones((m, 1), dtype=bm.float64) # (m, 1)
+        kwargs = bm.context(xval)
+        eeen = bm.ones((n, 1), **kwargs) # (n, 1)
+        eeem = bm.ones((m, 1), **kwargs) # (m, 1)
         
         # 更新渐近线
         low, upp = self._update_asymptotes(xval, xmin, xmax, xold1, xold2) # (n, 1), (n, 1)
@@ -284,8 +327,6 @@ class MMAOptimizer(OptimizerBase):
         p0 = p0 * ux2 # (n, 1)
         q0 = q0 * xl2 # (n, 1)
         # 构建 P, Q 和 b 构建约束函数的近似
-        P = bm.zeros((m, n), dtype=bm.float64)
-        Q = bm.zeros((m, n), dtype=bm.float64)
         P = bm.maximum(dfdx, 0)
         Q = bm.maximum(-dfdx, 0)
         PQ = 0.001 * (P + Q) + raa0 * bm.dot(eeem, xmami_inv.T)
@@ -329,17 +370,21 @@ class MMAOptimizer(OptimizerBase):
             rho_phys[:] = rho
 
         # 初始化历史记录
-        history = OptimizationHistory()
+        history = OptimizationHistory(density_buffer=self.options.history_buffer,
+                                      scalar_buffer=self.options.history_scalars)
+        start_iter = self.options.start_iter
+        if start_iter > 0:
+            history.restore(start_iter)
 
         xold1 = bm.copy(rho)  # 当前的设计变量
         xold2 = bm.copy(rho)  # 初始化为当前的设计变量
         
         # 优化主循环
-        for iter_idx in range(max_iters):
+        for iter_idx in range(start_iter, max_iters):
             start_time = time()
             
             # 更新迭代计数
-            self._epoch = iter_idx + 1
+            self._epoch = iter_idx + 1 - start_iter
             
             # 使用物理密度计算目标函数值和梯度
             obj_val = self.objective.fun(rho_phys)
@@ -389,10 +434,13 @@ class MMAOptimizer(OptimizerBase):
 
             history.log_iteration(iter_idx, obj_val, vol_frac, 
                                 change, iteration_time, rho_phys)
+            # 回调收到的是历史记录中的密度快照, 不会被后续迭代覆盖
+            if self.options.history_callback is not None:
+                self.options.history_callback(iter_idx, history.densities[-1], rho, history)
             
             # 处理 Heaviside 投影的 beta continuation
             if isinstance(self.filter, HeavisideProjectionBasicFilter):
-                change, continued = self.filter.continuation_step(change)
+                change, continued = self.filter.continuation_step(change, iter_idx)
                 if continued:
                     continue
             
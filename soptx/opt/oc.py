@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable
 from time import time
 from dataclasses import dataclass
 import warnings
@@ -43,12 +43,42 @@ class OCOptions:
         """二分法收敛容差"""
         return self._bisection_tol
 
+    @property
+    def bisection_impl(self) -> Optional[Callable[..., TensorLike]]:
+        """二分法求解拉格朗日乘子的自定义实现, 为 None 时使用默认实现"""
+        return self._bisection_impl
+
+    @property
+    def history_buffer(self) -> Optional[TensorLike]:
+        """预分配的密度历史缓冲区 (max_iterations, NC)"""
+        return self._history_buffer
+
+    @property
+    def history_scalars(self) -> Optional[TensorLike]:
+        """预分配的标量历史缓冲区 (max_iterations, 4)"""
+        return self._history_scalars
+
+    @property
+    def history_callback(self) -> Optional[Callable[[int, TensorLike, TensorLike, OptimizationHistory], Any]]:
+        """每次迭代记录历史后的回调 (iter_idx, density, rho, history)"""
+        return self._history_callback
+
+    @property
+    def start_iter(self) -> int:
+        """起始迭代编号, 大于 0 时从断点续算"""
+        return self._start_iter
+
     def __init__(self):
         """初始化高级参数的默认值"""
         self._move_limit = 0.2
         self._damping_coef = 0.5
         self._initial_lambda = 1e9
         self._bisection_tol = 1e-3
+        self._bisection_impl = None
+        self._history_buffer = None
+        self._history_scalars = None
+        self._history_callback = None
+        self._start_iter = 0
         
     def set_advanced_options(self, **kwargs):
         """设置高级选项，仅供专业用户使用
@@ -59,6 +89,17 @@ class OCOptions:
             - damping_coef : 阻尼系数
             - initial_lambda : 初始 lambda 值
             - bisection_tol : 二分法收敛容差
+            - bisection_impl : 二分法的自定义实现 (如编译后的内核), 调用形式为
+                bisection_impl(rho, dc, dg, cell_measure, volume_fraction, 
+                               l1, l2, bisection_tol, move_limit, damping_coef) -> rho_new,
+                只适用于物理密度等于设计变量的情形 (无滤波或灵敏度滤波)
+            - history_buffer : 预分配的密度历史缓冲区 (max_iterations, NC)
+            - history_scalars : 预分配的标量历史缓冲区 (max_iterations, 4)
+            - history_callback : 每次迭代记录历史后的回调 (iter_idx, density, rho, history),
+                density 为物理密度的快照, rho 为设计变量, history 为当前的历史记录;
+                缓冲区在 jax 等后端上写入时会被替换, 需通过 history 访问最新的缓冲区
+            - start_iter : 起始迭代编号, 大于 0 时从断点续算,
+                此前的历史记录从 history_buffer 和 history_scalars 中恢复
         """
         warnings.warn("Modifying advanced options may affect algorithm stability",
                      UserWarning)
@@ -67,7 +108,12 @@ class OCOptions:
             'move_limit': '_move_limit',
             'damping_coef': '_damping_coef',
             'initial_lambda': '_initial_lambda',
-            'bisection_tol': '_bisection_tol'
+            'bisection_tol': '_bisection_tol',
+            'bisection_impl': '_bisection_impl',
+            'history_buffer': '_history_buffer',
+            'history_scalars': '_history_scalars',
+            'history_callback': '_history_callback',
+            'start_iter': '_start_iter'
         }
         
         for key, value in kwargs.items():
@@ -150,6 +196,11 @@ class OCOptimizer(OptimizerBase):
         max_iters = self.options.max_iterations
         tol = self.options.tolerance
         bisection_tol = self.options.bisection_tol
+        bisection_impl = self.options.bisection_impl
+        if bisection_impl is not None and not isinstance(self.filter, (type(None), SensitivityBasicFilter)):
+            raise ValueError("'bisection_impl' requires the physical density to equal the design "
+                             f"variables, which does not hold for {type(self.filter).__name__}")
+        cell_measure = self.constraint.mesh.entity_measure('cell')
         
         tensor_kwargs = bm.context(rho)
         rho_phys = bm.zeros_like(rho, **tensor_kwargs)
@@ -161,10 +212,14 @@ class OCOptimizer(OptimizerBase):
         #     rho_phys[:] = rho
         
         # 初始化历史记录
-        history = OptimizationHistory()
+        history = OptimizationHistory(density_buffer=self.options.history_buffer,
+                                      scalar_buffer=self.options.history_scalars)
+        start_iter = self.options.start_iter
+        if start_iter > 0:
+            history.restore(start_iter)
         
         # 优化主循环
-        for iter_idx in range(max_iters):
+        for iter_idx in range(start_iter, max_iters):
             start_time = time()
             
             # 使用物理密度计算目标函数值和梯度
@@ -185,21 +240,31 @@ class OCOptimizer(OptimizerBase):
             
             # 二分法求解拉格朗日乘子
             l1, l2 = 0.0, self.options.initial_lambda
-            while (l2 - l1) / (l2 + l1) > bisection_tol:
-                lmid = 0.5 * (l2 + l1)
-                rho_new = self._update_density(rho, obj_grad, con_grad, lmid)
-                
-                # 计算新的物理密度
+            if bisection_impl is not None:
+                rho_new = bisection_impl(rho, obj_grad, con_grad, cell_measure, 
+                                         self.constraint.volume_fraction, 
+                                         l1, l2, bisection_tol, 
+                                         self.options.move_limit, self.options.damping_coef)
                 if self.filter is not None:
                     rho_phys = self.filter.filter_variables(rho_new, rho_phys)
                 else:
                     rho_phys = rho_new
+            else:
+                while (l2 - l1) / (l2 + l1) > bisection_tol:
+                    lmid = 0.5 * (l2 + l1)
+                    rho_new = self._update_density(rho, obj_grad, con_grad, lmid)
+                
+                    # 计算新的物理密度
+                    if self.filter is not None:
+                        rho_phys = self.filter.filter_variables(rho_new, rho_phys)
+                    else:
+                        rho_phys = rho_new
 
-                # 检查约束函数值
-                if self.constraint.fun(rho_phys) > 0:
-                    l1 = lmid
-                else:
-                    l2 = lmid
+                    # 检查约束函数值
+                    if self.constraint.fun(rho_phys) > 0:
+                        l1 = lmid
+                    else:
+                        l2 = lmid
             # 计算收敛性
             change = bm.max(bm.abs(rho_new - rho))
             # 更新设计变量，确保目标函数内部状态同步
@@ -210,10 +275,13 @@ class OCOptimizer(OptimizerBase):
 
             history.log_iteration(iter_idx, obj_val, vol_frac, 
                                 change, iteration_time, rho_phys[:])
+            # 回调收到的是历史记录中的密度快照, 不会被后续迭代覆盖
+            if self.options.history_callback is not None:
+                self.options.history_callback(iter_idx, history.densities[-1], rho, history)
             
             # 处理 Heaviside 投影的 beta continuation
             if isinstance(self.filter, HeavisideProjectionBasicFilter):
-                change, continued = self.filter.continuation_step(change)
+                change, continued = self.filter.continuation_step(change, iter_idx)
                 if continued:
                     continue
                 
@@ -20,6 +20,10 @@ class OptimizationHistory:
     iteration_times: List[float] = field(default_factory=list)
     # 优化开始时间
     start_time: float = field(default_factory=time)
+    # 预分配的密度历史缓冲区 (max_iterations, NC), 提供时 densities 中保存其行视图
+    density_buffer: Optional[TensorLike] = None
+    # 预分配的标量历史缓冲区 (max_iterations, 4): 目标函数值, 体积分数, 变化量, 迭代时间
+    scalar_buffer: Optional[TensorLike] = None
     
     def log_iteration(self, 
                      iter_idx: int, 
@@ -30,7 +34,17 @@ class OptimizationHistory:
                      density: TensorLike,
                      verbose: bool = True) -> None:
         """记录一次迭代的信息"""
-        self.densities.append(bm.copy(density))
+        if self.density_buffer is not None:
+            # 写入预分配的缓冲区, 避免每次迭代复制一份新的密度
+            self.density_buffer = bm.set_at(self.density_buffer, iter_idx, density)
+            self.densities.append(self.density_buffer[iter_idx])
+        else:
+            self.densities.append(bm.copy(density))
+        if self.scalar_buffer is not None:
+            # 四个标量拼成一行, 一次写入
+            row = bm.tensor([float(obj_val), float(volfrac), float(change), float(time_cost)],
+                            **bm.context(self.scalar_buffer))
+            self.scalar_buffer = bm.set_at(self.scalar_buffer, iter_idx, row)
         self.obj_values.append(obj_val)
         self.con_values.append(volfrac)
         self.iteration_times.append(time_cost)
@@ -42,6 +56,16 @@ class OptimizationHistory:
                   f"Change: {change:.4f}, "
                   f"Time: {time_cost:.3f} sec")
     
+    def restore(self, n_iter: int) -> None:
+        """从预分配的缓冲区恢复前 n_iter 次迭代的记录, 用于断点续算"""
+        if self.density_buffer is not None:
+            self.densities = [self.density_buffer[i] for i in range(n_iter)]
+        if self.scalar_buffer is not None:
+            scalars = bm.to_numpy(self.scalar_buffer[:n_iter])
+            self.obj_values = [float(v) for v in scalars[:, 0]]
+            self.con_values = [float(v) for v in scalars[:, 1]]
+            self.iteration_times = [float(v) for v in scalars[:, 3]]
+
     def get_total_time(self) -> float:
         """获取总优化时间"""
         return time() - self.start_time
@@ -98,11 +122,23 @@ def save_optimization_history(mesh, history, save_path=None):
         return
         
     for i, density in enumerate(history.densities):
-        mesh.celldata['density'] = density
-        if isinstance(mesh, StructuredMesh):
-            mesh.to_vtk(f"{save_path}/density_iter_{i:03d}.vts")
-        else:  
-            mesh.to_vtk(f"{save_path}/density_iter_{i:03d}.vtu")
+        save_density(mesh, density, i, save_path)
+
+def save_density(mesh, density, iter_idx, save_path):
+    """保存单次迭代的密度场, 可作为 history_callback 在后台线程中调用
+    
+    Parameters
+    - mesh : 有限元网格对象
+    - density : 该次迭代的密度场
+    - iter_idx : 迭代编号
+    - save_path : 保存路径
+    """
+    # 设备到主机的拷贝在调用方线程中完成
+    mesh.celldata['density'] = bm.to_numpy(density)
+    if isinstance(mesh, StructuredMesh):
+        mesh.to_vtk(f"{save_path}/density_iter_{iter_idx:03d}.vts")
+    else:  
+        mesh.to_vtk(f"{save_path}/density_iter_{iter_idx:03d}.vtu")
 
 def plot_optimization_history(history, save_path=None, show=True, title=None, 
                             fontsize=20, figsize=(14, 10), linewidth=2.5,
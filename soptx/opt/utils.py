@@ -65,18 +65,19 @@ def solve_mma_subproblem(m: int, n: int,
     """
 
     # 变量初始化
-    een = bm.ones((n, 1))
-    eem = bm.ones((m, 1))
+    kwargs = bm.context(alfa)
+    een = bm.ones((n, 1), **kwargs)
+    eem = bm.ones((m, 1), **kwargs)
     x = 0.5 * (alfa + beta)
     y = bm.copy(eem)
-    z = bm.array([[1.0]])
+    z = bm.array([[1.0]], **kwargs)
     lam = bm.copy(eem)
     xsi = een / (x - alfa)
     xsi = bm.maximum(xsi, een)
     eta = een / (beta - x)
     eta = bm.maximum(eta, een)
     mu = bm.maximum(eem, 0.5*c)
-    zet = bm.array([[1.0]])
+    zet = bm.array([[1.0]], **kwargs)
     s = bm.copy(eem)
 
     epsi = 1 # 松弛参数, 每次外循环迭代中逐步减小   
@@ -165,7 +166,7 @@ def solve_mma_subproblem(m: int, n: int,
                 blam = dellam + dely / diagy - bm.dot(GG, (delx / diagx)) # (m, 1)
                 bb = bm.concatenate((blam, delz), axis=0)                 # (m+1, 1)
                 # TODO 使用 einsum 替代对角矩阵乘法
-                D_lamyi = diaglamyi * bm.eye(1)  
+                D_lamyi = diaglamyi * bm.eye(1, **kwargs)  
                 GD_xG = bm.einsum('ik, k, jk -> ij', GG, diagxinv.flatten(), GG)  
                 Alam = D_lamyi + GD_xG  # (m, 1)
                 # Alam = bm.asarray(d5 = riags(diaglamyi.flatten(), 0) + \
@@ -182,7 +183,7 @@ def solve_mma_subproblem(m: int, n: int,
                 diaglamyiinv = eem / diaglamyi
                 dellamyi = dellam + dely/diagy
                 # TODO 使用 einsum 替代对角矩阵乘法
-                D_x = diagx * bm.eye(1)
+                D_x = diagx * bm.eye(1, **kwargs)
                 GD_lamyiG = bm.einsum('ik, k, jk -> ij', GG, diaglamyiinv.flatten(), GG)
                 Axx = D_x + GD_lamyiG
                 # Axx = bm.asarray(diags(diagx.flatten(), 0) + \
@@ -0,0 +1,53 @@
+from typing import Tuple
+
+from fealpy.backend import backend_manager as bm
+from fealpy.typing import TensorLike
+
+class ConvolutionFilter:
+    """结构网格上的无矩阵过滤算子
+
+    结构网格上的过滤矩阵 H 是平移不变的锥形核, H @ x 等价于在密度场上做一次卷积,
+    因此只存储 (2*sx-1) x (2*sy-1) [x (2*sz-1)] 的权重核, 不显式组装 H.
+    对外提供与 CSRTensor 一致的 matmul 接口, 可直接替换过滤策略中的 H.
+    """
+    def __init__(self, kernel: TensorLike, grid_shape: Tuple[int, ...]):
+        """
+        Parameters
+        - kernel : 权重核, 各方向长度均为奇数, 中心对应单元自身
+        - grid_shape : 单元网格形状 (nx, ny) 或 (nx, ny, nz),
+            与单元线性编号 i * ny + j (k + j * nz + i * ny * nz) 的 C 序一致
+        """
+        self.kernel = kernel
+        self.grid_shape = tuple(grid_shape)
+        self._padding = tuple(s // 2 for s in kernel.shape)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        NC = 1
+        for n in self.grid_shape:
+            NC *= n
+
+        return (NC, NC)
+
+    def matmul(self, x: TensorLike) -> TensorLike:
+        """计算 H @ x, 其中 x 形状为 (NC, )
+
+        核关于中心对称, 卷积与互相关结果相同; 网格外按零延拓
+        """
+        X = bm.reshape(x, self.grid_shape)
+
+        if bm.backend_name == 'pytorch':
+            import torch.nn.functional as F
+            conv = F.conv2d if len(self.grid_shape) == 2 else F.conv3d
+            Y = conv(X[None, None], self.kernel[None, None], padding=self._padding)[0, 0]
+        elif bm.backend_name == 'jax':
+            from jax.scipy.signal import convolve
+            Y = convolve(X, self.kernel, mode='same')
+        else:
+            from scipy.ndimage import correlate
+            Y = correlate(X, self.kernel, mode='constant', cval=0.0)
+
+        return bm.reshape(Y, (-1, ))
+
+    def __matmul__(self, x: TensorLike) -> TensorLike:
+        return self.matmul(x)
@@ -32,6 +32,7 @@ class Filter(BaseLogged):
                 mesh: HomogeneousMesh,
                 filter_type: Literal['none', 'sensitivity', 'density', 'heaviside_density'],
                 rmin: Optional[float] = None,
+                matrix_free: bool = False,
                 enable_logging: bool = True,
                 logger_name: Optional[str] = None,
             ) -> None:
@@ -51,7 +52,8 @@ class Filter(BaseLogged):
         # 1. 构建过滤矩阵
         if self.filter_type != 'none' and self.rmin > 0:
             builder = FilterMatrixBuilder(mesh, rmin)
-            self._H, self._Hs = builder.build()
+            # matrix_free 时结构网格上的 H 为卷积算子, 不显式组装
+            self._H, self._Hs = builder.build(matrix_free=matrix_free)
             self._cell_measure = self.mesh.entity_measure('cell')
             self._normalize_factor = self._H.matmul(self._cell_measure)
         else:
@@ -1,5 +1,9 @@
-from typing import Tuple, Set, List
-from math import ceil, sqrt
+from typing import Tuple, Set, List, Union, Callable, Any
+from math import ceil
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 from fealpy.backend import backend_manager as bm
 from fealpy.mesh import Mesh
@@ -7,6 +11,14 @@ from fealpy.typing import TensorLike
 from fealpy.sparse import COOTensor, CSRTensor
 from soptx.utils import timer
 
+from .convolution_filter import ConvolutionFilter
+
+try:
+    import numexpr as ne
+except ImportError:
+    # numexpr 为可选依赖, 缺失时距离计算使用 bm 的向量化实现
+    ne = None
+
 class FilterMatrixBuilder:
     """负责构建拓扑优化中使用的稀疏过滤矩阵 H"""
     def __init__(self, mesh: Mesh, rmin: float):
@@ -17,13 +29,32 @@ class FilterMatrixBuilder:
         self.rmin = rmin
         self.device = mesh.device
 
-    def build(self) -> Tuple[CSRTensor, TensorLike]:
-        """构建并返回过滤矩阵 H 和其行和 Hs"""
+    def build(self, matrix_free: bool = False) -> Tuple[Union[CSRTensor, ConvolutionFilter], TensorLike]:
+        """构建并返回过滤矩阵 H 和其行和 Hs
+        
+        Parameters
+        - matrix_free : 为 True 且网格为结构网格时, 返回无矩阵的卷积算子代替 H
+        """
         mesh_keys: Set[str] = set(self.mesh.meshdata.keys())
         
         keys_3d: Set[str] = {'nx', 'ny', 'nz', 'hx', 'hy', 'hz'}
         keys_2d: Set[str] = {'nx', 'ny', 'hx', 'hy'}
 
+        if matrix_free:
+            meshdata = self.mesh.meshdata
+            if keys_3d.issubset(mesh_keys) and meshdata['mesh_type'] == 'hexahedron':
+                return self._compute_filter_convolution(
+                                self.rmin,
+                                (meshdata['nx'], meshdata['ny'], meshdata['nz']),
+                                (meshdata['hx'], meshdata['hy'], meshdata['hz']),
+                            )
+            elif keys_2d.issubset(mesh_keys) and meshdata['mesh_type'] in {'quadrangle'}:
+                return self._compute_filter_convolution(
+                                self.rmin,
+                                (meshdata['nx'], meshdata['ny']),
+                                (meshdata['hx'], meshdata['hy']),
+                            )
+
         if keys_3d.issubset(mesh_keys) and self.mesh.meshdata['mesh_type'] == 'hexahedron':
             return self._compute_filter_3d(
                             self.rmin,
@@ -43,6 +74,83 @@ class FilterMatrixBuilder:
                                 self.mesh.entity_barycenter('cell'), 
                             )
         
+    def _map_batches(self, func: Callable[[int], Any], n_batches: int) -> List[Any]:
+        """按批次编号顺序返回 func 的结果
+        
+        各批次互不依赖, CPU 上用线程池并行处理 (numpy/torch 的数组运算会释放 GIL);
+        GPU 上的计算已经是并行的, 按顺序逐批执行即可
+        """
+        if n_batches > 1 and str(self.device) == 'cpu':
+            with ThreadPoolExecutor() as executor:
+                return list(executor.map(func, range(n_batches)))
+        
+        return [func(batch_idx) for batch_idx in range(n_batches)]
+
+    def _assemble_filter_matrix(self, 
+                                iH: TensorLike, jH: TensorLike, sH: TensorLike, 
+                                NC: int
+                            ) -> Tuple[CSRTensor, TensorLike]:
+        """由 CPU 上的三元组组装过滤矩阵 H 及其行和 Hs
+
+        先转换为 CSR 格式, 只将 CSR 一次性转移到目标设备; 
+        Hs 在目标设备上由 CSR 按行求和得到: 对 values 做前缀和后按 crow 取差值, 为一次线性扫描
+        """
+        H = COOTensor(
+            indices=bm.stack((iH, jH), axis=0),
+            values=sH,
+            spshape=(NC, NC)
+        )
+        H = H.tocsr()
+        H = H.device_put(self.device)
+
+        crow = H.crow
+        ZERO = bm.zeros((1, ), dtype=bm.float64, device=self.device)
+        values_cumsum = bm.concat([ZERO, bm.cumsum(H.values, axis=0)], axis=0)
+        Hs = values_cumsum[crow[1:]] - values_cumsum[crow[:-1]]
+
+        return H, Hs
+
+    def _stencil_row_sum(self, W: TensorLike, grid_shape: Tuple[int, ...]) -> TensorLike:
+        """由模板权重表解析计算结构网格上过滤矩阵的行和 Hs
+        
+        单元 (i, j[, k]) 的行和是 W 在网格内偏移范围上的截断和: 内部单元为 W 的总和,
+        边界附近的单元为 W 的一个子块和. 用 W 的前缀和 (summed-area table) 按容斥原理
+        对每个单元 O(1) 求出, 无需遍历模板.
+
+        Parameters
+        - W : 模板权重表, 形状为 (2*sx-1, 2*sy-1[, 2*sz-1]), 非正权重已置 0
+        - grid_shape : 单元网格形状 (nx, ny[, nz])
+        """
+        GD = len(grid_shape)
+        device = bm.get_device(W)
+
+        # 各方向做前缀和, 并在前端补一层 0
+        P = W
+        for axis in range(GD):
+            P = bm.cumsum(P, axis=axis)
+            pad = list(P.shape)
+            pad[axis] = 1
+            P = bm.concat([bm.zeros(tuple(pad), dtype=P.dtype, device=device), P], axis=axis)
+
+        # 单元 i 可取的偏移 di ∈ [-i, n-1-i] 与模板 [-(s-1), s-1] 的交, 对应 P 中的区间 [lo, hi)
+        lo, hi = [], []
+        for axis, n in enumerate(grid_shape):
+            s = (W.shape[axis] + 1) // 2
+            i = bm.arange(n, dtype=bm.int64, device=device)
+            shape = [1] * GD
+            shape[axis] = n
+            lo.append(bm.reshape(bm.clip(s - 1 - i, 0, None), shape))
+            hi.append(bm.reshape(bm.clip(s - 1 + n - i, None, 2 * s - 1), shape))
+
+        # 容斥原理: 盒子和 = Σ (-1)^{GD - #hi} P[corner]
+        Hs = 0
+        for corner in product((0, 1), repeat=GD):
+            idx = tuple(hi[axis] if c else lo[axis] for axis, c in enumerate(corner))
+            sign = (-1)**(GD - sum(corner))
+            Hs = Hs + sign * P[idx]
+
+        return bm.reshape(Hs, (-1, ))
+
     def _compute_filter_general(self, 
                                 rmin: float,
                                 domain: List[float],
@@ -72,71 +180,70 @@ class FilterMatrixBuilder:
         # 使用 KD-tree 查询临近点
         # ! 该函数会将目前许需要将变脸 转移到 CPU 上进行计算
         cell_centers = bm.device_put(cell_centers, 'cpu')
-        cell_indices, neighbor_indices = bm.query_point(
-                                            x=cell_centers, y=cell_centers, h=rmin, 
-                                            box_size=domain, mask_self=False, periodic=periodic
-                                        )
-        if enable_timing:
-            t.send('KD-tree 查询时间')
 
         # 计算节点总数
         NC = cell_centers.shape[0]
-        
-        # 准备存储过滤器矩阵的数组
-        # 预估非零元素的数量（包括对角线元素）
-        max_nnz = len(cell_indices) + NC
-        iH = bm.zeros(max_nnz, dtype=bm.int32)
-        jH = bm.zeros(max_nnz, dtype=bm.int32)
-        sH = bm.zeros(max_nnz, dtype=bm.float64)
-        
-        # 首先添加对角线元素（自身单元）
-        for i in range(NC):
-            iH[i] = i
-            jH[i] = i
-            # 自身权重为 rmin（最大权重）
-            sH[i] = rmin
-        
-        # 当前非零元素计数
-        nnz = NC
-        
-        # 填充其余非零元素（邻居点）
-        for idx in range(len(cell_indices)):
-            i = cell_indices[idx]
-            j = neighbor_indices[idx]
-            
-            # 计算节点间的物理距离
-            physical_dist = bm.sqrt(bm.sum((cell_centers[i] - cell_centers[j])**2))
-            
-            # 计算权重因子
-            fac = rmin - physical_dist
-            
-            if fac > 0:
-                iH[nnz] = i
-                jH[nnz] = j
-                sH[nnz] = fac
-                nnz += 1
 
-        if enable_timing:
-            t.send('循环计算时间')
-        
-        # 创建稀疏矩阵（只使用有效的非零元素）
-        H = COOTensor(
-            indices=bm.astype(bm.stack((iH[:nnz], jH[:nnz]), axis=0), bm.int32),
-            values=sH[:nnz],
-            spshape=(NC, NC)
-        )
+        # 过滤核对称, 只保留 i < j 的邻居对, 再镜像得到 (j, i)
+        if not any(periodic):
+            # 非周期情形由 KD-tree 直接返回邻居对及其距离, 无需重新计算距离
+            from scipy.spatial import cKDTree
+            tree = cKDTree(bm.to_numpy(cell_centers))
+            pairs = tree.sparse_distance_matrix(tree, max_distance=rmin, output_type='ndarray')
+            pairs = pairs[pairs['i'] < pairs['j']]
+            ci = bm.from_numpy(pairs['i'].astype(np.int32))
+            ni = bm.from_numpy(pairs['j'].astype(np.int32))
+            physical_dist = bm.from_numpy(np.ascontiguousarray(pairs['v']))
+
+            if enable_timing:
+                t.send('KD-tree 查询时间')
+        else:
+            cell_indices, neighbor_indices = bm.query_point(
+                                                x=cell_centers, y=cell_centers, h=rmin, 
+                                                box_size=domain, mask_self=False, periodic=periodic
+                                            )
+            if enable_timing:
+                t.send('KD-tree 查询时间')
+
+            upper = cell_indices < neighbor_indices
+            ci = cell_indices[upper]
+            ni = neighbor_indices[upper]
+
+            # 一次性计算所有邻居对的物理距离
+            if ne is not None and bm.backend_name == 'numpy':
+                # numpy 后端下由 numexpr 融合 相减-平方-求和-开方, 多线程分块计算
+                GD = cell_centers.shape[1]
+                local_dict = {}
+                for d in range(GD):
+                    local_dict[f'a{d}'] = cell_centers[ci, d]
+                    local_dict[f'b{d}'] = cell_centers[ni, d]
+                expr = ' + '.join(f'(a{d} - b{d})**2' for d in range(GD))
+                physical_dist = ne.evaluate(f'sqrt({expr})', local_dict=local_dict)
+            else:
+                # 利用 |a-b|^2 = |a|^2 + |b|^2 - 2 a·b, |c|^2 按单元预计算一次, 
+                # 消去误差可能带来的微小负值截断为 0
+                sq = bm.sum(cell_centers * cell_centers, axis=1)
+                dot = bm.einsum('ij, ij -> i', cell_centers[ci], cell_centers[ni])
+                physical_dist = bm.sqrt(bm.clip(sq[ci] + sq[ni] - 2 * dot, 0.0, None))
+
+        # 权重因子
+        fac = rmin - physical_dist
+        mask = fac > 0
+        ci = bm.astype(ci[mask], bm.int32)
+        ni = bm.astype(ni[mask], bm.int32)
+        fac = fac[mask]
+
+        # 对角线元素 (自身单元) 的权重为 rmin (最大权重), 其余为有效的邻居对
+        diag = bm.arange(NC, dtype=bm.int32, device='cpu')
+        iH = bm.concat([diag, ci, ni], axis=0)
+        jH = bm.concat([diag, ni, ci], axis=0)
+        sH = bm.concat([bm.full((NC, ), rmin, dtype=bm.float64, device='cpu'), fac, fac], axis=0)
 
-        Hs = H @ bm.ones(H.shape[1], dtype=bm.float64, device='cpu')
-        
-        H = H.tocsr()
-        H = H.device_put(self.device)
-        Hs = bm.device_put(Hs, self.device)
-        
-        # # 转换为 CSR 格式以便于后续操作
-        # H = H.tocsr()
+        if enable_timing:
+            t.send('距离计算时间')
         
-        # # 计算滤波矩阵行和
-        # Hs = H @ bm.ones(H.shape[1], dtype=bm.float64)
+        # 创建稀疏矩阵
+        H, Hs = self._assemble_filter_matrix(iH, jH, sH, NC)
 
         if enable_timing:
             t.send('稀疏矩阵构建时间')
@@ -151,7 +258,7 @@ class FilterMatrixBuilder:
                         enable_timing: bool = True,
                     ) -> Tuple[CSRTensor, TensorLike]:
         """高性能优化的 2D 滤波矩阵计算 - 分块处理版本
-        即使设备选取为 GPU, 该函数也会先将其转移到 CPU 进行计算"""
+        模板权重与位置无关, 全部计算直接在网格所在设备上进行"""
 
         NC = self.mesh.number_of_cells()
         expected_NC = nx * ny
@@ -173,195 +280,52 @@ class FilterMatrixBuilder:
         batch_size = min(10000, nx * ny) 
         n_batches = (nx * ny + batch_size - 1) // batch_size 
         
-        # 创建一个映射函数，从线性索引转换为 2D 坐标
-        def linear_to_2d(linear_idx):
-            i = linear_idx // ny  
-            j = linear_idx % ny   
-            return i, j
-        
-        # 预计算每个格子的物理坐标 
-        all_coords = bm.zeros((nx * ny, 2), dtype=bm.float64, device='cpu')
+        # 预计算模板权重表, 所有单元共享同一组相对偏移 (di, dj), 只保留权重为正的偏移
+        device = self.device
+        dx = bm.arange(-(search_radius_x - 1), search_radius_x, dtype=bm.int32, device=device)
+        dy = bm.arange(-(search_radius_y - 1), search_radius_y, dtype=bm.int32, device=device)
+        DX, DY = bm.meshgrid(dx, dy, indexing='ij')
+        W = rmin - bm.sqrt((bm.astype(DX, bm.float64) * hx)**2 + (bm.astype(DY, bm.float64) * hy)**2)
+        keep = W > 0
 
-        for idx in range(nx * ny):
-            i, j = linear_to_2d(idx)
-            all_coords[idx, 0] = i * hx  
-            all_coords[idx, 1] = j * hy  
+        # 行和由模板权重表解析得到, 与 H 的组装无关
+        Hs = self._stencil_row_sum(W * keep, (nx, ny))
+
+        DX, DY, W = DX[keep], DY[keep], W[keep]
         
         if enable_timing:
             t.send('预处理')
         
-        # 初始化存储结果的列表
-        all_rows = [] 
-        all_cols = []  
-        all_vals = []  
+        # 每行的非零元个数按行号写入各自的位置, 各批次互不重叠
+        # 单元按行号顺序处理且模板偏移按字典序排列, 列号在行内天然有序, 可直接输出 CSR 格式
+        counts = bm.zeros(nx * ny, dtype=bm.int64, device=device)
         
-        # 分批处理所有单元
-        for batch_idx in range(n_batches):
+        def _process_batch(batch_idx):
+            """批内所有单元与模板偏移一次性广播, 返回该批次的列号和滤波因子"""
             start_idx = batch_idx * batch_size
             end_idx = min((batch_idx + 1) * batch_size, nx * ny)
             
-            batch_rows = []
-            batch_cols = []
-            batch_vals = []
+            rows = bm.arange(start_idx, end_idx, dtype=bm.int32, device=device)
+            II = (rows // ny)[:, None] + DX[None, :]
+            JJ = (rows % ny)[:, None] + DY[None, :]
             
-            # 获取当前批次单元的物理坐标
-            batch_coords = all_coords[start_idx:end_idx]
-            
-            # 处理当前批次中的每个单元
-            for local_idx, global_idx in enumerate(range(start_idx, end_idx)):
-                i, j = linear_to_2d(global_idx)
-                row = global_idx  
-                
-                # 计算搜索范围 - 与原始函数完全相同
-                ii1 = max(0, i - (search_radius_x - 1))
-                ii2 = min(nx, i + search_radius_x)
-                jj1 = max(0, j - (search_radius_y - 1))
-                jj2 = min(ny, j + search_radius_y)
-                
-                # 创建搜索范围内所有单元的线性索引
-                search_indices = []
-                for ii in range(ii1, ii2):
-                    for jj in range(jj1, jj2):
-                        col = ii * ny + jj
-                        search_indices.append(col)
-                
-                if not search_indices:
-                    continue
-                
-                # 获取搜索单元的物理坐标
-                search_coords = all_coords[search_indices]
-                
-                # 计算与当前单元的距离
-                current_coords = batch_coords[local_idx].reshape(1, 2)  
-                diffs = search_coords - current_coords 
-                squared_dists = bm.sum(diffs * diffs, axis=1)  
-                distances = bm.sqrt(squared_dists)
-                
-                # 计算滤波因子
-                factors = rmin - distances 
-                valid_mask = factors > 0  
-                
-                # 只保留有效的单元对
-                if bm.any(valid_mask):
-                    valid_cols = bm.array(search_indices, device='cpu')[valid_mask]
-                    valid_factors = factors[valid_mask]
-                    
-                    # 收集结果
-                    batch_rows.extend([row] * len(valid_cols))
-                    batch_cols.extend(valid_cols.tolist())
-                    batch_vals.extend(valid_factors.tolist())
-            
-            # 将当前批次结果添加到总结果
-            all_rows.extend(batch_rows)
-            all_cols.extend(batch_cols)
-            all_vals.extend(batch_vals)
-
-        
-        if enable_timing:
-            t.send('计算距离和过滤矩阵')
-        
-        if all_rows:
-            iH = bm.tensor(all_rows, dtype=bm.int32, device='cpu')
-            jH = bm.tensor(all_cols, dtype=bm.int32, device='cpu')
-            sH = bm.tensor(all_vals, dtype=bm.float64, device='cpu')
-        else:
-            iH = bm.tensor([], dtype=bm.int32, device='cpu')
-            jH = bm.tensor([], dtype=bm.int32, device='cpu')
-            sH = bm.tensor([], dtype=bm.float64, device='cpu')
-        
-        H = COOTensor(
-            indices=bm.stack((iH, jH), axis=0),
-            values=sH,
-            spshape=(nx * ny, nx * ny)
-        )
-        
-        # ! PyTorch 后端对 COOTensor 的支持更好
-        Hs = H @ bm.ones(H.shape[1], dtype=bm.float64, device='cpu')
-        
-        H = H.tocsr()
-        H = H.device_put(self.device)
-        Hs = bm.device_put(Hs, self.device)
+            # 只保留落在网格内的单元对
+            mask = (II >= 0) & (II < nx) & (JJ >= 0) & (JJ < ny)
+            counts[start_idx:end_idx] = bm.sum(mask, axis=1)
 
-        if enable_timing:
-            t.send('矩阵构建')
-            t.send(None)
+            return (II * ny + JJ)[mask], bm.broadcast_to(W[None, :], mask.shape)[mask]
         
-        return H, Hs
-
-    def _compute_filter_2d_math(self,
-                                rmin: float, 
-                                nx: int, ny: int, 
-                                hx: float, hy: float,
-                                enable_timing: bool = True,
-                            ) -> Tuple[COOTensor, TensorLike]:
-        """计算 2D 滤波矩阵 - 数学原理的直接实现版本
-            即使设备选取为 GPU, 该函数也会先将其转移到 CPU 进行计算"""
-
-        NC = self.mesh.number_of_cells()
-        expected_NC = nx * ny
-        assert NC == expected_NC, (
-            f"'_compute_filter_2d' is strictly for simple quadrangle grids. "
-            f"Expected {expected_NC} cells (nx*ny), but found {NC}."
-        )
-
-        t = None
-        if enable_timing:
-            t = timer(f"Filter_2d_math")
-            next(t)
-
-        min_h = min(hx, hy)
-        max_cells = ceil(rmin/min_h)
-        nfilter = int(nx * ny * ((2 * (max_cells - 1) + 1) ** 2))
+        # 分批处理所有单元
+        results = self._map_batches(_process_batch, n_batches)
+        jH = bm.concat([r[0] for r in results], axis=0)
+        sH = bm.concat([r[1] for r in results], axis=0)
         
-        iH = bm.zeros(nfilter, dtype=bm.int32, device='cpu')   
-        jH = bm.zeros(nfilter, dtype=bm.int32, device='cpu')   
-        sH = bm.zeros(nfilter, dtype=bm.float64, device='cpu') 
-        cc = 0
-
-        if enable_timing:
-            t.send('预处理')
-
-        for i in range(nx):
-            for j in range(ny):
-                # 单元的编号顺序: y->x 
-                row = i * ny + j
-                # 根据物理距离计算搜索范围
-                kk1 = int(max(i - (ceil(rmin/hx) - 1), 0))
-                kk2 = int(min(i + ceil(rmin/hx), nx))
-                ll1 = int(max(j - (ceil(rmin/hy) - 1), 0))
-                ll2 = int(min(j + ceil(rmin/hy), ny))
-                
-                for k in range(kk1, kk2):
-                    for l in range(ll1, ll2):
-                        # 单元的编号顺序: y->x 
-                        col = k * ny + l
-                        # 计算实际物理距离
-                        physical_dist = sqrt((i - k)**2 * hx**2 + (j - l)**2 * hy**2)
-                        fac = rmin - physical_dist
-                        if fac > 0:
-                            # ! bm.set_at 的性能相比直接赋值更慢
-                            # iH[cc] = row
-                            # jH[cc] = col
-                            # sH[cc] = max(0.0, fac)
-                            iH = bm.set_at(iH, cc, row)
-                            jH = bm.set_at(jH, cc, col)
-                            sH = bm.set_at(sH, cc, max(0.0, fac))
-                            cc += 1
-
         if enable_timing:
             t.send('计算距离和过滤矩阵')
-
-        H = COOTensor(
-                indices=bm.astype(bm.stack((iH[:cc], jH[:cc]), axis=0), bm.int32),
-                values=sH[:cc],
-                spshape=(nx * ny, nx * ny)
-            )
-        
-        Hs = H @ bm.ones(H.shape[1], dtype=bm.float64, device='cpu')
         
-        H = H.tocsr()
-        H = H.device_put(self.device)
-        Hs = bm.device_put(Hs, self.device)
+        crow = bm.concat([bm.zeros(1, dtype=bm.int64, device=device), bm.cumsum(counts, axis=0)], axis=0)
+        # 列索引与行指针统一使用 int64
+        H = CSRTensor(crow=crow, col=bm.astype(jH, bm.int64), values=sH, spshape=(nx * ny, nx * ny))
 
         if enable_timing:
             t.send('矩阵构建')
@@ -374,7 +338,7 @@ class FilterMatrixBuilder:
                         nx: int, ny: int, nz: int, 
                         hx: float, hy: float, hz: float,
                         enable_timing: bool = True,
-                    ) -> Tuple[COOTensor, TensorLike]:
+                    ) -> Tuple[CSRTensor, TensorLike]:
         """高性能优化的 3D 过滤矩阵计算 - 分块处理版本"""
         
         t = None
@@ -390,116 +354,57 @@ class FilterMatrixBuilder:
         batch_size = min(10000, nx * ny * nz)  
         n_batches = (nx * ny * nz + batch_size - 1) // batch_size
         
-        # 创建一个映射函数，从线性索引转换为 3D 坐标
-        def linear_to_3d(linear_idx):
-            i = linear_idx // (ny * nz)
-            j = (linear_idx % (ny * nz)) // nz
-            k = linear_idx % nz
-            return i, j, k
-        
-        # 预计算每个格子的物理坐标 
-        all_coords = bm.zeros((nx * ny * nz, 3), dtype=bm.float64, device='cpu')
-        
-        for idx in range(nx * ny * nz):
-            i, j, k = linear_to_3d(idx)
-            all_coords[idx, 0] = i * hx
-            all_coords[idx, 1] = j * hy
-            all_coords[idx, 2] = k * hz
+        # 预计算模板权重表, 所有单元共享同一组相对偏移 (di, dj, dk), 只保留权重为正的偏移
+        device = self.device
+        dx = bm.arange(-(search_radius_x - 1), search_radius_x, dtype=bm.int32, device=device)
+        dy = bm.arange(-(search_radius_y - 1), search_radius_y, dtype=bm.int32, device=device)
+        dz = bm.arange(-(search_radius_z - 1), search_radius_z, dtype=bm.int32, device=device)
+        DX, DY, DZ = bm.meshgrid(dx, dy, dz, indexing='ij')
+        W = rmin - bm.sqrt((bm.astype(DX, bm.float64) * hx)**2 
+                           + (bm.astype(DY, bm.float64) * hy)**2 
+                           + (bm.astype(DZ, bm.float64) * hz)**2)
+        keep = W > 0
+
+        # 行和由模板权重表解析得到, 与 H 的组装无关
+        Hs = self._stencil_row_sum(W * keep, (nx, ny, nz))
+
+        DX, DY, DZ, W = DX[keep], DY[keep], DZ[keep], W[keep]
                 
         if enable_timing:
             t.send('预处理')
 
-        # 初始化存储结果的列表
-        all_rows = []
-        all_cols = []
-        all_vals = []
+        # 每行的非零元个数按行号写入各自的位置, 各批次互不重叠
+        # 单元按行号顺序处理且模板偏移按字典序排列, 列号在行内天然有序, 可直接输出 CSR 格式
+        counts = bm.zeros(nx * ny * nz, dtype=bm.int64, device=device)
         
-        # 分批处理所有单元
-        for batch_idx in range(n_batches):
+        def _process_batch(batch_idx):
+            """批内所有单元与模板偏移一次性广播, 返回该批次的列号和滤波因子"""
             start_idx = batch_idx * batch_size
             end_idx = min((batch_idx + 1) * batch_size, nx * ny * nz)
             
-            batch_rows = []
-            batch_cols = []
-            batch_vals = []
-            
-            # 获取当前批次单元的坐标
-            batch_coords = all_coords[start_idx:end_idx]
+            rows = bm.arange(start_idx, end_idx, dtype=bm.int32, device=device)
+            II = (rows // (ny * nz))[:, None] + DX[None, :]
+            JJ = ((rows % (ny * nz)) // nz)[:, None] + DY[None, :]
+            KK = (rows % nz)[:, None] + DZ[None, :]
             
-            # 处理当前批次中的每个单元
-            for local_idx, global_idx in enumerate(range(start_idx, end_idx)):
-                i, j, k = linear_to_3d(global_idx)
-                row = global_idx
-                
-                # 计算搜索范围 - 与原始函数完全相同
-                ii1 = max(0, i - (search_radius_x - 1))
-                ii2 = min(nx, i + search_radius_x)
-                jj1 = max(0, j - (search_radius_y - 1))
-                jj2 = min(ny, j + search_radius_y)
-                kk1 = max(0, k - (search_radius_z - 1))
-                kk2 = min(nz, k + search_radius_z)
-                
-                # 创建搜索范围内所有单元的线性索引
-                search_indices = []
-                for ii in range(ii1, ii2):
-                    for jj in range(jj1, jj2):
-                        for kk in range(kk1, kk2):
-                            col = kk + jj * nz + ii * ny * nz
-                            search_indices.append(col)
-                
-                if not search_indices:
-                    continue
-                    
-                # 获取搜索单元的物理坐标
-                search_coords = all_coords[search_indices]
-                
-                # 计算与当前单元的距离
-                current_coords = batch_coords[local_idx].reshape(1, 3) 
-                diffs = search_coords - current_coords  
-                squared_dists = bm.sum(diffs * diffs, axis=1) 
-                distances = bm.sqrt(squared_dists) 
-                
-                # 计算滤波因子
-                factors = rmin - distances 
-                valid_mask = factors > 0  
-                
-                if bm.any(valid_mask):
-                    valid_cols = bm.array(search_indices, device='cpu')[valid_mask]
-                    valid_factors = factors[valid_mask]
-                    
-                    # 收集结果
-                    batch_rows.extend([row] * len(valid_cols))
-                    batch_cols.extend(valid_cols.tolist())
-                    batch_vals.extend(valid_factors.tolist())
-            
-            # 添加批次结果到总结果
-            all_rows.extend(batch_rows)
-            all_cols.extend(batch_cols)
-            all_vals.extend(batch_vals)
+            # 只保留落在网格内的单元对
+            mask = ((II >= 0) & (II < nx) & (JJ >= 0) & (JJ < ny) 
+                    & (KK >= 0) & (KK < nz))
+            counts[start_idx:end_idx] = bm.sum(mask, axis=1)
+
+            return (KK + JJ * nz + II * ny * nz)[mask], bm.broadcast_to(W[None, :], mask.shape)[mask]
+        
+        # 分批处理所有单元
+        results = self._map_batches(_process_batch, n_batches)
+        jH = bm.concat([r[0] for r in results], axis=0)
+        sH = bm.concat([r[1] for r in results], axis=0)
                 
         if enable_timing:
             t.send('计算距离和过滤因子')
 
-        if all_rows:
-            iH = bm.tensor(all_rows, dtype=bm.int32, device='cpu')
-            jH = bm.tensor(all_cols, dtype=bm.int32, device='cpu')
-            sH = bm.tensor(all_vals, dtype=bm.float64, device='cpu')
-        else:
-            # 处理边缘情况
-            iH = bm.tensor([], dtype=bm.int32, device='cpu')
-            jH = bm.tensor([], dtype=bm.int32, device='cpu')
-            sH = bm.tensor([], dtype=bm.float64, device='cpu')
-        
-        H = COOTensor(
-            indices=bm.stack((iH, jH), axis=0),
-            values=sH,
-            spshape=(nx * ny * nz, nx * ny * nz)
-        )
-        
-        H = H.tocsr()
-        H = H.device_put(self.device)
-        
-        Hs = H @ bm.ones(H.shape[1], dtype=bm.float64, device=self.device)
+        crow = bm.concat([bm.zeros(1, dtype=bm.int64, device=device), bm.cumsum(counts, axis=0)], axis=0)
+        # 列索引与行指针统一使用 int64
+        H = CSRTensor(crow=crow, col=bm.astype(jH, bm.int64), values=sH, spshape=(nx * ny * nz, nx * ny * nz))
 
         if enable_timing:
             t.send('矩阵构建')
@@ -507,79 +412,34 @@ class FilterMatrixBuilder:
         
         return H, Hs
     
-    def _compute_filter_3d_math(self,
-                                rmin: float, 
-                                nx: int, ny: int, nz: int, 
-                                hx: float, hy: float, hz: float,
-                                enable_timing: bool = True,
-                            ) -> Tuple[COOTensor, TensorLike]:
-        """计算 3D 滤波矩阵 - 数学原理的直接实现版本"""
-
+    def _compute_filter_convolution(self,
+                                rmin: float,
+                                grid_shape: Tuple[int, ...],
+                                h: Tuple[float, ...],
+                                enable_timing: bool = False,
+                            ) -> Tuple[ConvolutionFilter, TensorLike]:
+        """结构网格上的无矩阵过滤: 只构建权重核, H @ x 以卷积实现"""
         t = None
         if enable_timing:
-            t = timer(f"Filter_3d_math")
+            t = timer(f"Filter_convolution")
             next(t)
 
-        min_h = min(hx, hy, hz)
-        max_cells = ceil(rmin/min_h)
-        nfilter = nx * ny * nz * ((2 * (max_cells - 1) + 1) ** 3)
-        
-        iH = bm.zeros(nfilter, dtype=bm.int32, device='cpu')
-        jH = bm.zeros(nfilter, dtype=bm.int32, device='cpu')
-        sH = bm.zeros(nfilter, dtype=bm.float64, device='cpu')
-        cc = 0
-
-        if enable_timing:
-            t.send('预处理')
-
-        for i in range(nx):
-            for j in range(ny):
-                for k in range(nz):
-                    # 单元的编号顺序: z -> y -> x
-                    row = k + j * nz + i * ny * nz
-                    ii1 = int(max(i - (ceil(rmin/hx) - 1), 0))
-                    ii2 = int(min(i + ceil(rmin/hx), nx))
-                    jj1 = int(max(j - (ceil(rmin/hy) - 1), 0))
-                    jj2 = int(min(j + ceil(rmin/hy), ny))
-                    kk1 = int(max(k - (ceil(rmin/hz) - 1), 0))
-                    kk2 = int(min(k + ceil(rmin/hz), nz))
-                    
-                    for ii in range(ii1, ii2):
-                        for jj in range(jj1, jj2):
-                            for kk in range(kk1, kk2):
-                                # 单元的编号顺序: z -> y -> x
-                                col = kk + jj * nz + ii * ny * nz
-                                # 计算实际物理距离 
-                                physical_dist = sqrt(
-                                                    (i - ii)**2 * hx**2 + 
-                                                    (j - jj)**2 * hy**2 + 
-                                                    (k - kk)**2 * hz**2
-                                                )
-                                fac = rmin - physical_dist
-                                if fac > 0:
-                                    # ! bm.set_at 的性能相比直接赋值更慢
-                                    # iH[cc] = row
-                                    # jH[cc] = col
-                                    # sH[cc] = max(0.0, fac)
-                                    iH = bm.set_at(iH, cc, row)
-                                    jH = bm.set_at(jH, cc, col)
-                                    sH = bm.set_at(sH, cc, max(0.0, fac))
-                                    cc += 1
+        # 各方向的模板偏移 d * h, d ∈ [-(s-1), s-1]
+        axes = []
+        for hi in h:
+            s = ceil(rmin / hi)
+            d = bm.arange(-(s - 1), s, dtype=bm.int32, device=self.device)
+            axes.append(bm.astype(d, bm.float64) * hi)
+        D = bm.meshgrid(*axes, indexing='ij')
 
-        if enable_timing:
-            t.send('计算距离和过滤因子')
+        kernel = rmin - bm.sqrt(sum(Di**2 for Di in D))
+        kernel = kernel * (kernel > 0)
 
-        H = COOTensor(
-            indices=bm.astype(bm.stack((iH[:cc], jH[:cc]), axis=0), bm.int32),
-            values=sH[:cc],
-            spshape=(nx * ny * nz, nx * ny * nz)
-        )
-        H = H.tocsr()
-        H = H.device_put(self.device)
-        Hs = H @ bm.ones(H.shape[1], dtype=bm.float64, device=self.device)
+        H = ConvolutionFilter(kernel, grid_shape)
+        Hs = H.matmul(bm.ones(H.shape[1], dtype=bm.float64, device=self.device))
 
         if enable_timing:
-            t.send('矩阵构建')
+            t.send('权重核构建')
             t.send(None)
 
-        return H, Hs
\ No newline at end of file
+        return H, Hs
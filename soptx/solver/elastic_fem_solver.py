@@ -35,6 +35,7 @@ class AssemblyMethod(Enum):
     VOIGT = auto()                # Voigt 格式组装
     FAST = auto()                 # 快速组装
     SYMBOLIC = auto()             # 符号组装
+    BATCHED = auto()              # 批量组装: 缓存的基础局部刚度矩阵按单元模量缩放, 按固定稀疏结构一次散射
 
 class ElasticFEMSolver:
     """专门用于求解线弹性问题的有限元求解器
@@ -50,7 +51,7 @@ class ElasticFEMSolver:
                 materials: BaseElasticMaterialInstance, 
                 tensor_space: TensorFunctionSpace,
                 pde,
-                assembly_method: AssemblyMethod,
+                assembly_method: Optional[AssemblyMethod],
                 solver_type: str,
                 solver_params: Optional[dict]):
         """
@@ -59,16 +60,17 @@ class ElasticFEMSolver:
         materials : 材料
         tensor_space : 张量函数空间
         pde : 包含荷载和边界条件的 PDE 模型
-        assembly_method : 矩阵组装方法
+        assembly_method : 矩阵组装方法, 为 None 时由 select_assembly_method 自动选择
         solver_type : 求解器类型, 'cg' 或 'direct' 
         solver_params : 求解器参数
             cg: maxiter, atol, rtol
-            direct: solver_type
+            direct: solver_type, 'mumps', 'scipy' 或 'cupy' (GPU)
         """
         self.materials = materials
         self.tensor_space = tensor_space
         self.pde = pde
-        self.assembly_method = assembly_method
+        self.assembly_method = (self.select_assembly_method(tensor_space) 
+                                if assembly_method is None else assembly_method)
         self.solver_type = solver_type
         self.solver_params = solver_params or {}
 
@@ -80,6 +82,22 @@ class ElasticFEMSolver:
         # 缓存
         self._base_local_stiffness_matrix = None
         self._base_local_trace_matrix = None
+        self._stiffness_pattern = None
+
+    @staticmethod
+    def select_assembly_method(tensor_space: TensorFunctionSpace) -> AssemblyMethod:
+        """根据网格类型和空间次数选择组装方法
+        
+        单纯形网格和结构网格上, FAST 组装把参考单元上的积分预先算好, 
+        每个单元的计算量与积分点个数无关, 总是优先使用.
+        其他网格上 FAST 组装的每个单元的计算量为 LDOF^2 * GD^2 * NQ, 
+        比 STANDARD 组装多 GD^2 倍, 只在 p = 1 (LDOF 和 NQ 都很小) 时使用
+        """
+        mesh = tensor_space.mesh
+        if isinstance(mesh, (SimplexMesh, StructuredMesh)) or tensor_space.p == 1:
+            return AssemblyMethod.FAST
+        
+        return AssemblyMethod.STANDARD
 
     #---------------------------------------------------------------------------
     # 公共属性
@@ -281,6 +299,7 @@ class ElasticFEMSolver:
             AssemblyMethod.VOIGT: 'voigt',
             AssemblyMethod.FAST: 'fast',
             AssemblyMethod.SYMBOLIC: 'symbolic',
+            AssemblyMethod.BATCHED: None,
         }
         
         method = method_map[self.assembly_method]
@@ -291,8 +310,46 @@ class ElasticFEMSolver:
         
         return integrator
     
+    def _get_stiffness_pattern(self):
+        """获取全局刚度矩阵的稀疏结构 (会被缓存)
+
+        Returns
+        - crow, col : CSR 格式的行指针和列索引
+        - inverse : 局部刚度矩阵各元素在 CSR 非零元中的位置, 形状为 (NC*TLDOF*TLDOF, )
+        """
+        if self._stiffness_pattern is None:
+            cell2dof = self.tensor_space.cell_to_dof()     # (NC, TLDOF)
+            gdof = self.tensor_space.number_of_global_dofs()
+            NC, TLDOF = cell2dof.shape
+            shape = (NC, TLDOF, TLDOF)
+
+            I = bm.astype(bm.broadcast_to(cell2dof[:, :, None], shape), bm.int64)
+            J = bm.astype(bm.broadcast_to(cell2dof[:, None, :], shape), bm.int64)
+            key, inverse = bm.unique(bm.reshape(I * gdof + J, (-1, )), return_inverse=True)
+
+            # key 按行优先有序, 由行号直接得到 CSR 的行指针
+            row = key // gdof
+            col = key % gdof
+            kwargs = {'dtype': row.dtype, 'device': bm.get_device(row)}
+            crow = bm.searchsorted(row, bm.arange(gdof + 1, **kwargs))
+
+            self._stiffness_pattern = (crow, col, inverse)
+
+        return self._stiffness_pattern
+
     def _assemble_global_stiffness_matrix(self) -> CSRTensor:
         """组装全局刚度矩阵"""    
+        if self.assembly_method == AssemblyMethod.BATCHED:
+            # 所有单元的局部刚度矩阵一次批量缩放, 再一次 index_add 散射到 CSR 非零元
+            crow, col, inverse = self._get_stiffness_pattern()
+            KE = self.compute_local_stiffness_matrix()
+            gdof = self.tensor_space.number_of_global_dofs()
+            values = bm.zeros(col.shape, **bm.context(KE))
+            values = bm.index_add(values, inverse, bm.reshape(KE, (-1, )))
+            K = CSRTensor(crow=crow, col=col, values=values, spshape=(gdof, gdof))
+
+            return K
+
         integrator = self._integrator
         bform = BilinearForm(self.tensor_space)
         bform.add_integrator(integrator)
@@ -537,7 +594,10 @@ class ElasticFEMSolver:
 
         try:
             # TODO 能否支持批量求解
-            uh[:] = spsolve(K, F[:], solver=solver_type)
+            if solver_type == 'cupy' and bm.backend_name == 'pytorch' and F.device.type == 'cuda':
+                uh[:] = self._cupy_spsolve(K, F[:])
+            else:
+                uh[:] = spsolve(K, F[:], solver=solver_type)
         except Exception as e:
             raise RuntimeError(f"Direct solver failed: {str(e)}")
         
@@ -545,4 +605,23 @@ class ElasticFEMSolver:
             t.send('求解时间')
             t.send(None)
 
-        return DirectSolverResult(displacement=uh)
\ No newline at end of file
+        return DirectSolverResult(displacement=uh)
+    
+    def _cupy_spsolve(self, K: CSRTensor, F: TensorLike) -> TensorLike:
+        """在 GPU 上用 cupy 求解 K u = F
+        
+        通过 DLPack 与 cupy 零拷贝共享 K 和 F 的显存, 解向量同样以 DLPack 返回,
+        整个求解过程不经过主机内存
+        """
+        import cupy as cp
+        from cupyx.scipy.sparse import csr_matrix
+        from cupyx.scipy.sparse.linalg import spsolve as cupy_spsolve
+        import torch
+
+        K_cp = csr_matrix((cp.from_dlpack(K.values), 
+                           cp.from_dlpack(bm.astype(K.col, bm.int32)), 
+                           cp.from_dlpack(bm.astype(K.crow, bm.int32))), 
+                          shape=K.shape)
+        x = cupy_spsolve(K_cp, cp.from_dlpack(F))
+
+        return torch.from_dlpack(x)
\ No newline at end of file
@@ -124,7 +124,7 @@ def create_base_components(config: TestConfig):
     kwargs = bm.context(node)
     @cartesian
     def density_func(x: TensorLike):
-        val = config.volume_fraction * bm.ones(x.shape[0], **kwargs)
+        val = bm.full((x.shape[0], ), config.volume_fraction, **kwargs)
         # val = bm.ones(x.shape[0], **kwargs)
         return val
     rho = space_D.interpolate(u=density_func)
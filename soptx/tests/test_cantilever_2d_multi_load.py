@@ -119,7 +119,7 @@ def create_base_components(config: TestConfig):
     kwargs = bm.context(node)
     @cartesian
     def density_func(x: TensorLike):
-        val = config.init_volume_fraction * bm.ones(x.shape[0], **kwargs)
+        val = bm.full((x.shape[0], ), config.init_volume_fraction, **kwargs)
         return val
     rho = space_D.interpolate(u=density_func)
 
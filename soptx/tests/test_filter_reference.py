@@ -0,0 +1,166 @@
+from math import ceil, sqrt
+
+import numpy as np
+
+from fealpy.backend import backend_manager as bm
+from fealpy.sparse import COOTensor
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # numba 为可选依赖, 缺失时内核退化为普通的 Python 循环
+    prange = range
+
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+@njit(cache=True, parallel=True)
+def _fill_filter_3d(rmin, nx, ny, nz, hx, hy, hz, slab, iH, jH, sH, counts):
+    """填充 3D 滤波矩阵的三元组, 第 i 层写入 [i*slab, (i+1)*slab) 分段,
+    并将该层的非零元素个数记录在 counts[i] 中"""
+    sx = int(ceil(rmin/hx))
+    sy = int(ceil(rmin/hy))
+    sz = int(ceil(rmin/hz))
+    hx2, hy2, hz2 = hx**2, hy**2, hz**2
+    for i in prange(nx):
+        cc = i * slab
+        for j in range(ny):
+            for k in range(nz):
+                # 单元的编号顺序: z -> y -> x
+                row = k + j * nz + i * ny * nz
+                ii1 = max(i - (sx - 1), 0)
+                ii2 = min(i + sx, nx)
+                jj1 = max(j - (sy - 1), 0)
+                jj2 = min(j + sy, ny)
+                kk1 = max(k - (sz - 1), 0)
+                kk2 = min(k + sz, nz)
+
+                for ii in range(ii1, ii2):
+                    dx2 = (i - ii)**2 * hx2
+                    for jj in range(jj1, jj2):
+                        dxy2 = dx2 + (j - jj)**2 * hy2
+                        base = jj * nz + ii * ny * nz
+                        for kk in range(kk1, kk2):
+                            col = kk + base
+                            physical_dist = sqrt(dxy2 + (k - kk)**2 * hz2)
+                            fac = rmin - physical_dist
+                            if fac > 0:
+                                iH[cc] = row
+                                jH[cc] = col
+                                sH[cc] = fac
+                                cc += 1
+        counts[i] = cc - i * slab
+
+class FilterReference:
+    """结构网格过滤矩阵的参考实现, 仅作为测试的标准答案, 不参与 FilterMatrixBuilder 的分派
+
+    结果均在 CPU 上, Hs 按定义 H @ 1 计算
+    """
+    @staticmethod
+    def _reference_assemble(iH, jH, sH, NC):
+        H = COOTensor(
+                indices=bm.astype(bm.stack((iH, jH), axis=0), bm.int32),
+                values=sH,
+                spshape=(NC, NC)
+            )
+        H = H.tocsr()
+        Hs = H @ bm.ones(NC, dtype=bm.float64, device='cpu')
+
+        return H, Hs
+
+    @staticmethod
+    def _reference_filter_2d(rmin: float, nx: int, ny: int, hx: float, hy: float):
+        """在固定模板上广播构建 iH, jH, sH"""
+        search_radius_x = ceil(rmin/hx)
+        search_radius_y = ceil(rmin/hy)
+
+        # 固定模板的相对偏移 (2*sx-1, 2*sy-1), 权重只与偏移有关, 与单元位置无关
+        dx = bm.arange(-(search_radius_x - 1), search_radius_x, dtype=bm.int32, device='cpu')
+        dy = bm.arange(-(search_radius_y - 1), search_radius_y, dtype=bm.int32, device='cpu')
+        DX, DY = bm.meshgrid(dx, dy, indexing='ij')
+        w0 = rmin - bm.sqrt((bm.astype(DX, bm.float64) * hx)**2 + (bm.astype(DY, bm.float64) * hy)**2)
+
+        # 广播得到 (nx, ny, 2*sx-1, 2*sy-1) 的邻居索引, 单元的编号顺序: y->x
+        I = bm.arange(nx, dtype=bm.int32, device='cpu')[:, None, None, None]
+        J = bm.arange(ny, dtype=bm.int32, device='cpu')[None, :, None, None]
+        II = I + DX
+        JJ = J + DY
+        mask = (II >= 0) & (II < nx) & (JJ >= 0) & (JJ < ny) & (w0 > 0)
+
+        shape = mask.shape
+        iH = bm.broadcast_to(I * ny + J, shape)[mask]
+        jH = bm.broadcast_to(II * ny + JJ, shape)[mask]
+        sH = bm.broadcast_to(w0, shape)[mask]
+
+        return FilterReference._reference_assemble(iH, jH, sH, nx * ny)
+
+    @staticmethod
+    def _reference_filter_3d(rmin: float, nx: int, ny: int, nz: int, hx: float, hy: float, hz: float):
+        """逐元素循环在 _fill_filter_3d 中执行 (若安装了 numba 则 JIT 编译并按 x 层并行)"""
+        # 每个 x 层的非零元素个数上界, 各层写入互不重叠的分段
+        max_cells = ceil(rmin / min(hx, hy, hz))
+        slab = ny * nz * (2 * (max_cells - 1) + 1)**3
+
+        iH = np.zeros(nx * slab, dtype=np.int32)
+        jH = np.zeros(nx * slab, dtype=np.int32)
+        sH = np.zeros(nx * slab, dtype=np.float64)
+        counts = np.zeros(nx, dtype=np.int64)
+
+        _fill_filter_3d(rmin, nx, ny, nz, hx, hy, hz, slab, iH, jH, sH, counts)
+
+        # 按各层的计数合并分段, 保持 row 递增的顺序
+        keep = (np.arange(slab)[None, :] < counts[:, None]).reshape(-1)
+        iH = bm.from_numpy(iH[keep])
+        jH = bm.from_numpy(jH[keep])
+        sH = bm.from_numpy(sH[keep])
+
+        return FilterReference._reference_assemble(iH, jH, sH, nx * ny * nz)
+
+
+def test_2d_filter_reference(device):
+    '''准确性测试: 四边形网格, _compute_filter_2d 与参考实现的 H 和 Hs 一致'''
+    from soptx.regularization.matrix_builder import FilterMatrixBuilder
+
+    from soptx.pde import HalfMBBBeam2dData1
+
+    pde = HalfMBBBeam2dData1(domain=[0, 60, 0, 20])
+    pde.init_mesh.set('uniform_quad')
+    mesh = pde.init_mesh(nx=60, ny=20, device=device)
+
+    nx, ny = mesh.meshdata['nx'], mesh.meshdata['ny']
+    hx, hy = mesh.meshdata['hx'], mesh.meshdata['hy']
+    rmin = 2.4
+    builder = FilterMatrixBuilder(mesh=mesh, rmin=rmin)
+    H1, Hs1 = builder._compute_filter_2d(rmin=rmin, nx=nx, ny=ny, hx=hx, hy=hy, enable_timing=False)
+    H2, Hs2 = FilterReference._reference_filter_2d(rmin, nx, ny, hx, hy)
+
+    error = bm.max(bm.abs(bm.device_put(H1.toarray(), 'cpu') - H2.toarray()))
+    error1 = bm.max(bm.abs(bm.device_put(Hs1, 'cpu') - Hs2))
+    print(f"H 误差: {error}, Hs 误差: {error1}")
+    print("----------------")
+
+def test_3d_filter_reference(device):
+    '''准确性测试: 六面体网格, _compute_filter_3d 与参考实现的 H 和 Hs 一致'''
+    from fealpy.mesh import HexahedronMesh
+    from soptx.regularization.matrix_builder import FilterMatrixBuilder
+
+    nx, ny, nz = 30, 10, 4
+    mesh = HexahedronMesh.from_box(box=[0, nx, 0, ny, 0, nz], nx=nx, ny=ny, nz=nz, device=device)
+
+    rmin = 1.5
+    builder = FilterMatrixBuilder(mesh=mesh, rmin=rmin)
+    H1, Hs1 = builder._compute_filter_3d(rmin=rmin, nx=nx, ny=ny, nz=nz,
+                                         hx=1.0, hy=1.0, hz=1.0, enable_timing=False)
+    H2, Hs2 = FilterReference._reference_filter_3d(rmin, nx, ny, nz, 1.0, 1.0, 1.0)
+
+    error = bm.max(bm.abs(bm.device_put(H1.toarray(), 'cpu') - H2.toarray()))
+    error1 = bm.max(bm.abs(bm.device_put(Hs1, 'cpu') - Hs2))
+    print(f"H 误差: {error}, Hs 误差: {error1}")
+    print("----------------")
+
+if __name__ == "__main__":
+    test_2d_filter_reference(device='cpu')
+    test_3d_filter_reference(device='cpu')
+    print("FilterReference test completed successfully.")
@@ -54,6 +54,51 @@ def test_elastic_with_interpolated_rhs_solver(pde, mesh, p, solver_type):
 
     return uh
 
+def test_batched_assembly(pde, mesh, p):
+    """
+    准确性测试: BATCHED 组装得到的全局刚度矩阵与 FAST 组装的结果一致
+    """
+    space_C = LagrangeFESpace(mesh=mesh, p=p, ctype='C')
+    tensor_space_C = TensorFunctionSpace(space_C, (-1, 2))
+    space_D = LagrangeFESpace(mesh=mesh, p=0, ctype='D')
+
+    material_config = DensityBasedMaterialConfig(
+                            elastic_modulus=1,            
+                            minimal_modulus=1e-9,         
+                            poisson_ratio=0.3,            
+                            plane_type="plane_stress",    
+                            interpolation_model="SIMP",    
+                            penalty_factor=3
+                        )
+    materials = DensityBasedMaterialInstance(config=material_config)
+
+    node = mesh.entity('node')
+    kwargs = bm.context(node)
+    @cartesian
+    def density_func(x):
+        val = bm.full((x.shape[0], ), 0.5, **kwargs)
+        return val
+    rho = space_D.interpolate(u=density_func)
+
+    K = {}
+    for assembly_method in [AssemblyMethod.FAST, AssemblyMethod.BATCHED]:
+        solver = ElasticFEMSolver(
+                    materials=materials,
+                    tensor_space=tensor_space_C,
+                    pde=pde,
+                    assembly_method=assembly_method,
+                    solver_type='direct',
+                    solver_params={'solver_type': 'mumps'}, 
+                )
+        solver.update_status(rho[:])
+        K[assembly_method] = solver._assemble_global_stiffness_matrix()
+
+    error = bm.max(bm.abs(K[AssemblyMethod.FAST].to_dense() - K[AssemblyMethod.BATCHED].to_dense()))
+    print(f"BATCHED 与 FAST 组装的刚度矩阵误差: {error}")
+    assert error < 1e-10, f"BATCHED assembly differs from FAST by {error}"
+
+    return error
+
 def test_elastic_with_interpolated_rhs(pde, mesh, p, solver_type):
     """
     该函数适用于右端项 F 可以通过直接插值得到的情况,
@@ -202,6 +247,11 @@ if __name__ == "__main__":
 
     test_elastic_with_linearform_rhs(pde_linearform_rhs, mesh, p, solver_type='mumps')
 
+    from soptx.pde import HalfMBBBeam2dData1
+    pde_batched = HalfMBBBeam2dData1(domain=[0, 6, 0, 2], T=1)
+    mesh_batched = QuadrangleMesh.from_box(box=pde_batched.domain, nx=6, ny=2)
+    test_batched_assembly(pde_batched, mesh_batched, p)
+
     # from soptx.pde import HalfMBBBeam2dData1
     # domain_x, domain_y = 60, 20
     # nx, ny = 60, 20
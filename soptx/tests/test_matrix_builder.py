@@ -34,10 +34,11 @@ def test_2d_filter_matrix_three(device):
     '''
     准确性测试: 四边形网格, 三者的结果一致
     效率性测试: CPU 下, _compute_filter_2d 的速度最快,
-                 _compute_filter_2d_math 的速度次之, 
+                 参考实现 FilterReference._reference_filter_2d 的速度次之, 
                  _compute_filter_general 最慢
     '''
     from soptx.regularization.matrix_builder import FilterMatrixBuilder
+    from soptx.tests.test_filter_reference import FilterReference
 
     from soptx.pde import HalfMBBBeam2dData1
 
@@ -54,7 +55,7 @@ def test_2d_filter_matrix_three(device):
                                 hx=mesh.meshdata['hx'], hy=mesh.meshdata['hy'],
                                 )
 
-    H2, Hs2 = builder._compute_filter_2d_math(
+    H2, Hs2 = FilterReference._reference_filter_2d(
                                 rmin=rmin,
                                 nx=mesh.meshdata['nx'], ny=mesh.meshdata['ny'],
                                 hx=mesh.meshdata['hx'], hy=mesh.meshdata['hy'],
@@ -69,6 +70,28 @@ def test_2d_filter_matrix_three(device):
     error1 = bm.sum(bm.abs(H1.toarray() - H3.toarray()))
     print("----------------")
 
+def test_2d_filter_convolution(device):
+    '''
+    准确性测试: 四边形网格, 无矩阵卷积算子与显式过滤矩阵的 H @ x 和 Hs 一致
+    '''
+    from soptx.regularization.matrix_builder import FilterMatrixBuilder
+
+    from soptx.pde import HalfMBBBeam2dData1
+
+    pde = HalfMBBBeam2dData1(domain=[0, 1, 0, 1])
+    mesh = pde.create_mesh(mesh_type='quadrangle', nx=60, ny=20, threshold=None, device=device)
+
+    rmin = mesh.meshdata['nx'] * 0.04
+    builder = FilterMatrixBuilder(mesh=mesh, rmin=rmin)
+    H1, Hs1 = builder.build()
+    H2, Hs2 = builder.build(matrix_free=True)
+
+    x = mesh.entity_measure('cell')
+    error = bm.max(bm.abs(H1.matmul(x) - H2.matmul(x)))
+    error1 = bm.max(bm.abs(Hs1 - Hs2))
+    print(f"H @ x 误差: {error}, Hs 误差: {error1}")
+    print("----------------")
+
 if __name__ == "__main__":
 
     test_2d_filter_matrix(device='cuda')
@@ -1,6 +1,11 @@
-from dataclasses import dataclass
-from typing import Literal, Optional, Union, Dict, Any
+from dataclasses import dataclass, replace, asdict
+from typing import Literal, Optional, Union, Dict, Any, Tuple
 from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import numpy as np
 
 from fealpy.backend import backend_manager as bm
 from fealpy.typing import TensorLike
@@ -19,7 +24,37 @@ from soptx.filter import (SensitivityBasicFilter,
                           HeavisideProjectionBasicFilter)
 from soptx.opt import (ComplianceObjective, ComplianceConfig,
                        VolumeConstraint, VolumeConfig)
-from soptx.opt import OCOptimizer, MMAOptimizer, save_optimization_history, plot_optimization_history
+from soptx.opt import OCOptimizer, MMAOptimizer, save_density, plot_optimization_history
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # numba 为可选依赖, 缺失时 OC 使用默认的二分法实现
+    njit = None
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _oc_bisection(rho, dc, dg, cell_measure, volume_fraction, 
+                      l1, l2, bisection_tol, move_limit, damping_coef):
+        """OC bisection fused into one compiled loop (numpy backend, no density filter)."""
+        n = rho.shape[0]
+        rho_new = np.empty_like(rho)
+        target = volume_fraction * np.sum(cell_measure)
+        while (l2 - l1) / (l2 + l1) > bisection_tol:
+            lmid = 0.5 * (l2 + l1)
+            for i in prange(n):
+                r = rho[i] * (-dc[i] / (dg[i] * lmid)) ** damping_coef
+                rho_new[i] = max(0.0, max(rho[i] - move_limit, min(1.0, min(rho[i] + move_limit, r))))
+            # 体积约束按固定顺序串行求和, 保证每次运行二分的分支一致
+            volume = 0.0
+            for i in range(n):
+                volume += cell_measure[i] * rho_new[i]
+            if volume - target > 0:
+                l1 = lmid
+            else:
+                l2 = lmid
+
+        return rho_new
 
 @dataclass
 class TestConfig:
@@ -49,7 +84,7 @@ class TestConfig:
 
     p: int
     
-    assembly_method: AssemblyMethod
+    assembly_method: Optional[AssemblyMethod]    # None: 由 ElasticFEMSolver 按网格和 p 自动选择
     solver_type: Literal['cg', 'direct'] 
     solver_params: Dict[str, Any]
 
@@ -64,58 +99,92 @@ class TestConfig:
 
     save_dir: Union[str, Path]
 
+    dof_layout: Literal['dof_priority', 'gd_priority'] = 'dof_priority'
+    history_dtype: Literal['float32', 'float64'] = 'float32'
+    compile_objective: bool = False
+    checkpoint_every: int = 0
+
+_PDE_CLS = {
+    'half_mbb_beam_2d_1': HalfMBBBeam2dData1,
+    'mbb_beam_2d_2': MBBBeam2dData2,
+    'half_mbb_beam_2d_2': HalfMBBBeam2dData2,
+}
+
+_MESH_CLS = {
+    'quadrangle_mesh': QuadrangleMesh,
+    'triangle_mesh': TriangleMesh,
+}
+
+def _config_fingerprint(config: TestConfig) -> str:
+    """Identify the problem a checkpoint belongs to.
+
+    Output location, iteration budget and checkpoint interval do not change the
+    optimization path, so they are left out.
+    """
+    fields = asdict(config)
+    for key in ('save_dir', 'max_iterations', 'checkpoint_every'):
+        fields.pop(key)
+
+    return repr(sorted(fields.items()))
+
+@lru_cache(maxsize=8)
+def _build_spaces(backend: str, device: str, mesh_type: str, box: Tuple[float, ...],
+                  nx: int, ny: int, p: int, dof_layout: str = 'dof_priority'):
+    """Build (and cache) the mesh and function spaces for a given discretization.
+
+    Successive configs that only differ in filter/optimizer settings reuse the
+    same mesh, DOF numbering and quadrature setup. ``backend`` is part of the key
+    so that cached tensors always belong to the active backend. The node
+    coordinates are fetched once here and returned with the spaces.
+    """
+    mesh = _MESH_CLS[mesh_type].from_box(
+                                    box=list(box),
+                                    nx=nx, ny=ny,
+                                    device=device
+                                )
+
+    GD = mesh.geo_dimension()
+    
+    space_C = LagrangeFESpace(mesh=mesh, p=p, ctype='C')
+    # dof_priority-(GD, -1) 或 gd_priority-(-1, GD), 可用 profile_dof_layouts 比较两者的效率
+    shape = (GD, -1) if dof_layout == 'dof_priority' else (-1, GD)
+    tensor_space_C = TensorFunctionSpace(space_C, shape)
+    space_D = LagrangeFESpace(mesh=mesh, p=0, ctype='D')
+
+    node = mesh.entity('node')
+
+    return mesh, node, space_C, tensor_space_C, space_D
+
+@lru_cache(maxsize=8)
+def _build_filter_operator(mesh, rmin: float, domain: Tuple[float, ...]):
+    """Build (and cache) the filter matrix H and its row sums Hs on the mesh device.
+
+    The neighbor weights only depend on the mesh and the filter radius, so every
+    filter type on the same discretization shares one operator.
+    """
+    base_filter = SensitivityBasicFilter(mesh=mesh, rmin=rmin, domain=list(domain))
+
+    return base_filter.H, base_filter.Hs
+
 def create_base_components(config: TestConfig):
     """Create basic components needed for topology optimization based on configuration."""
 
-    if config.backend == 'numpy':
-        bm.set_backend('numpy')
-    elif config.backend == 'pytorch':
-        bm.set_backend('pytorch')
-    elif config.backend == 'jax':
-        bm.set_backend('jax')
+    # backend 名称直接交给 backend_manager, 未知的名称由其报错
+    bm.set_backend(config.backend)
 
-    if config.pde_type == 'half_mbb_beam_2d_1':
-        pde = HalfMBBBeam2dData1(
-                    xmin=0, xmax=config.domain_length,
-                    ymin=0, ymax=config.domain_width,
-                    T = config.load
-                )
-    elif config.pde_type == 'mbb_beam_2d_2':
-        pde = MBBBeam2dData2(
-                    xmin=0, xmax=config.domain_length,
-                    ymin=0, ymax=config.domain_width,
-                    T = config.load
-                )
-    elif config.pde_type == 'half_mbb_beam_2d_2':
-        pde = HalfMBBBeam2dData2(
+    pde = _PDE_CLS[config.pde_type](
                     xmin=0, xmax=config.domain_length,
                     ymin=0, ymax=config.domain_width,
                     T = config.load
                 )
 
-    if config.mesh_type == 'quadrangle_mesh':
-        mesh = QuadrangleMesh.from_box(
-                                    box=pde.domain(),
-                                    nx=config.nx, ny=config.ny,
-                                    device=config.device
-                                )
-    elif config.mesh_type == 'triangle_mesh':
-        mesh = TriangleMesh.from_box(
-                                box=pde.domain(), 
-                                nx=config.nx, ny=config.ny,
-                                device=config.device
-                            )
-
-    GD = mesh.geo_dimension()
-    
-    p = config.p
-    space_C = LagrangeFESpace(mesh=mesh, p=p, ctype='C')
-    #! dof_priority-(GD, -1) 的效率比 gd_prioirty-(-1, GD) 的效率要高
-    # tensor_space_C = TensorFunctionSpace(space_C, (-1, GD))
-    tensor_space_C = TensorFunctionSpace(space_C, (GD, -1))
+    mesh, node, space_C, tensor_space_C, space_D = _build_spaces(
+                                                config.backend, config.device, config.mesh_type,
+                                                tuple(pde.domain()), config.nx, config.ny, config.p,
+                                                config.dof_layout
+                                            )
     CGDOF = tensor_space_C.number_of_global_dofs()
     print(f"CGDOF: {CGDOF}")
-    space_D = LagrangeFESpace(mesh=mesh, p=0, ctype='D')
     
     material_config = DensityBasedMaterialConfig(
                             elastic_modulus=config.elastic_modulus,            
@@ -129,25 +198,37 @@ def create_base_components(config: TestConfig):
     
     materials = DensityBasedMaterialInstance(config=material_config)
 
+    # pytorch 后端在 CUDA 上的直接法未指定求解器时默认使用 cupy,
+    # 通过 DLPack 在设备上求解, 避免每次迭代将刚度矩阵拷回主机; 显式指定的求解器不做修改
+    solver_params = config.solver_params
+    if (config.backend == 'pytorch' and config.device == 'cuda' and
+            config.solver_type == 'direct' and 'solver_type' not in solver_params):
+        solver_params = {**solver_params, 'solver_type': 'cupy'}
+
     solver = ElasticFEMSolver(
                 materials=materials,
                 tensor_space=tensor_space_C,
                 pde=pde,
                 assembly_method=config.assembly_method,
                 solver_type=config.solver_type,
-                solver_params=config.solver_params 
+                solver_params=solver_params 
             )
     
-    node = mesh.entity('node')
     kwargs = bm.context(node)
     @cartesian
     def density_func(x: TensorLike):
-        val = config.init_volume_fraction * bm.ones(x.shape[0], **kwargs)
+        val = bm.full((x.shape[0], ), config.init_volume_fraction, **kwargs)
         return val
     rho = space_D.interpolate(u=density_func)
 
     obj_config = ComplianceConfig(diff_mode=config.diff_mode)
     objective = ComplianceObjective(solver=solver, config=obj_config)
+    if config.compile_objective and config.backend == 'pytorch':
+        # 形状和数据类型在整个优化过程中不变, 编译一次后重复使用;
+        # 预热调用在优化开始前完成图捕获, 求得的位移场会被目标函数缓存
+        import torch
+        objective.fun = torch.compile(objective.fun, dynamic=False, fullgraph=False)
+        objective.fun(rho[:])
     cons_config = VolumeConfig(diff_mode=config.diff_mode)
     constraint = VolumeConstraint(solver=solver, 
                                 volume_fraction=config.volume_fraction,
@@ -155,19 +236,47 @@ def create_base_components(config: TestConfig):
     
     return pde, rho, objective, constraint
 
+def profile_dof_layouts(config: TestConfig) -> str:
+    """Time one compliance evaluation under each DOF layout and return the faster one."""
+    timings = {}
+    for dof_layout in ('dof_priority', 'gd_priority'):
+        pde, rho, objective, constraint = create_base_components(replace(config, dof_layout=dof_layout))
+        start = perf_counter()
+        objective.fun(rho[:])
+        timings[dof_layout] = perf_counter() - start
+        print(f"{dof_layout}: {timings[dof_layout]:.4f} s")
+
+    best = min(timings, key=timings.get)
+    print(f"Fastest DOF layout: {best}")
+    
+    return best
+
 def run_basic_filter_test(config: TestConfig) -> Dict[str, Any]:
     pde, rho, objective, constraint = create_base_components(config)
     mesh = objective.solver.tensor_space.mesh
 
+    if config.filter_type != 'None':
+        filter_operator = _build_filter_operator(mesh, config.filter_radius, tuple(pde.domain()))
+
     if config.filter_type == 'None':
         filter = None
     elif config.filter_type == 'sensitivity':
-        filter = SensitivityBasicFilter(mesh=mesh, rmin=config.filter_radius, domain=pde.domain()) 
+        filter = SensitivityBasicFilter(mesh=mesh, rmin=config.filter_radius, domain=pde.domain(),
+                                        filter_operator=filter_operator) 
     elif config.filter_type == 'density':
-        filter = DensityBasicFilter(mesh=mesh, rmin=config.filter_radius, domain=pde.domain())
+        filter = DensityBasicFilter(mesh=mesh, rmin=config.filter_radius, domain=pde.domain(),
+                                    filter_operator=filter_operator)
     elif config.filter_type == 'heaviside':
-        filter = HeavisideProjectionBasicFilter(mesh=mesh, rmin=config.filter_radius, domain=pde.domain())  
+        # beta 每 50 次迭代加倍, 上限为 512, 整个序列预先放在设备上
+        beta_schedule = bm.tensor([min(2.0**(it // 50), 512.0) for it in range(config.max_iterations)],
+                                  dtype=bm.float64, device=config.device)
+        filter = HeavisideProjectionBasicFilter(mesh=mesh, rmin=config.filter_radius, domain=pde.domain(),
+                                                filter_operator=filter_operator,
+                                                beta_schedule=beta_schedule)  
 
+    NC = mesh.number_of_cells()
+    # 优化器中的张量与密度放在同一设备上
+    kwargs = bm.context(rho[:])
 
     if config.optimizer_type == 'oc':
         optimizer = OCOptimizer(
@@ -186,8 +295,10 @@ def run_basic_filter_test(config: TestConfig) -> Dict[str, Any]:
                                 initial_lambda=1e9,
                                 bisection_tol=1e-3
                             )
+        # numpy 后端且物理密度等于设计变量时, 使用编译后的二分法内核
+        if njit is not None and config.backend == 'numpy' and config.filter_type in {'None', 'sensitivity'}:
+            optimizer.options.set_advanced_options(bisection_impl=_oc_bisection)
     elif config.optimizer_type == 'mma':
-        NC = mesh.number_of_cells()
         optimizer = MMAOptimizer(
                         objective=objective,
                         constraint=constraint,
@@ -198,26 +309,92 @@ def run_basic_filter_test(config: TestConfig) -> Dict[str, Any]:
                         }
                     )
         # 设置高级参数 (可选)
+        # 上下界共用一块 (NC, 2) 的缓冲区, xmin 和 xmax 是其中的列视图
+        xbounds = bm.stack([bm.zeros(NC, **kwargs), bm.ones(NC, **kwargs)], axis=1)
         optimizer.options.set_advanced_options(
                                 m=1,
                                 n=NC,
-                                xmin=bm.zeros((NC, 1)),
-                                xmax=bm.ones((NC, 1)),
+                                xmin=xbounds[:, 0:1],
+                                xmax=xbounds[:, 1:2],
                                 a0=1,
-                                a=bm.zeros((1, 1)),
-                                c=1e4 * bm.ones((1, 1)),
-                                d=bm.zeros((1, 1)),
+                                a=bm.zeros((1, 1), **kwargs),
+                                c=bm.full((1, 1), 1e4, **kwargs),
+                                d=bm.zeros((1, 1), **kwargs),
                             )
     else:
         raise ValueError(f"Unsupported optimizer type: {config.optimizer_type}")
 
-    rho_opt, history = optimizer.optimize(rho=rho[:])
-    
-    # 保存结果
     save_path = Path(config.save_dir)
     save_path.mkdir(parents=True, exist_ok=True)
-    save_optimization_history(mesh, history, str(save_path))
-    plot_optimization_history(history, save_path=str(save_path))
+    # 密度场的 VTK 输出在后台线程中进行, 与下一次迭代的计算重叠;
+    # 各次写入共用 mesh.celldata, 因此只用一个工作线程
+    io_pool = ThreadPoolExecutor(max_workers=1)
+
+    # 预分配历史记录缓冲区, 每次迭代只做一次索引写入;
+    # 历史记录只用于输出和绘图, 默认以 float32 存储, 优化迭代本身仍为 float64
+    history_kwargs = {'dtype': getattr(bm, config.history_dtype), 'device': bm.get_device(rho[:])}
+    history_buffer = bm.empty((config.max_iterations, NC), **history_kwargs)
+    history_scalars = bm.empty((config.max_iterations, 4), **history_kwargs)
+
+    # 断点续算: 每 checkpoint_every 次迭代保存设计变量和历史记录,
+    # 存在与当前配置一致的断点文件时从中恢复, 跳过已完成的迭代;
+    # 断点只包含设计变量, 因此仅支持不带 Heaviside 投影的 OC (迭代之间无其他状态)
+    if config.checkpoint_every > 0 and (config.optimizer_type != 'oc' or
+                                        config.filter_type == 'heaviside'):
+        raise ValueError("Checkpointing is only supported for the OC optimizer "
+                         "without the Heaviside filter")
+    chkpt_file = save_path / 'chkpt.npz'
+    fingerprint = _config_fingerprint(config)
+    start_iter = 0
+    rho_init = rho[:]
+    # 本次运行是否恢复或写入过断点, 只有这种情况下结束后才删除断点文件
+    owns_checkpoint = False
+    if config.checkpoint_every > 0 and chkpt_file.exists():
+        chkpt = np.load(chkpt_file)
+        if ('fingerprint' in chkpt.files and str(chkpt['fingerprint']) == fingerprint
+                and int(chkpt['iter']) <= config.max_iterations):
+            start_iter = int(chkpt['iter'])
+            rho_init = bm.tensor(chkpt['rho'], **kwargs)
+            history_buffer = bm.set_at(history_buffer, slice(0, start_iter),
+                                       bm.tensor(chkpt['history_buffer'], **history_kwargs))
+            history_scalars = bm.set_at(history_scalars, slice(0, start_iter),
+                                        bm.tensor(chkpt['history_scalars'], **history_kwargs))
+            owns_checkpoint = True
+            print(f"Resuming from checkpoint {chkpt_file} at iteration {start_iter}")
+        else:
+            print(f"Ignoring checkpoint {chkpt_file}: it does not match the current config")
+
+    def history_callback(it, density, rho_it, history):
+        # 缓冲区从 history 中读取: jax 后端上 set_at 返回新数组, 局部变量不会被更新
+        nonlocal owns_checkpoint
+        io_pool.submit(save_density, mesh, density, it, str(save_path))
+        if config.checkpoint_every > 0 and (it + 1) % config.checkpoint_every == 0:
+            owns_checkpoint = True
+            np.savez(chkpt_file, iter=it + 1, rho=bm.to_numpy(rho_it),
+                     history_buffer=bm.to_numpy(history.density_buffer[:it + 1]),
+                     history_scalars=bm.to_numpy(history.scalar_buffer[:it + 1]),
+                     fingerprint=np.array(fingerprint))
+
+    optimizer.options.set_advanced_options(
+                            history_buffer=history_buffer,
+                            history_scalars=history_scalars,
+                            history_callback=history_callback,
+                            start_iter=start_iter,
+                        )
+
+    # rho[:] 返回 Function 底层张量的视图, 不会产生主机拷贝
+    assert str(bm.get_device(rho_init)).startswith(config.device), \
+        f"rho is on {bm.get_device(rho_init)}, expected {config.device}"
+    rho_opt, history = optimizer.optimize(rho=rho_init)
+    # 优化正常结束后删除本次运行的断点, 之后的运行从头开始;
+    # 未启用断点或断点属于其他配置时不做处理
+    if config.checkpoint_every > 0 and owns_checkpoint:
+        chkpt_file.unlink(missing_ok=True)
+    
+    # 等待所有密度场写入完成
+    io_pool.shutdown(wait=True)
+    # 只保存收敛曲线, 不弹出窗口阻塞后续的测试
+    plot_optimization_history(history, save_path=str(save_path), show=False)
     
     return {
         'optimal_density': rho_opt,
@@ -265,8 +442,9 @@ if __name__ == "__main__":
         penalty_factor=3.0,
         mesh_type=mesh_type, nx=nx, ny=ny, hx=1, hy=1,
         p = fem_p,
-        assembly_method=AssemblyMethod.FAST,
-        solver_type='direct', solver_params={'solver_type': 'mumps'},
+        assembly_method=AssemblyMethod.BATCHED,
+        # 不指定直接法求解器: pytorch + cuda 时默认使用 cupy, 否则为 mumps
+        solver_type='direct', solver_params={},
         # solver_type='cg', solver_params={'maxiter': 2000, 'atol': 1e-12, 'rtol': 1e-12},
         diff_mode='manual',
         # diff_mode='auto',
@@ -274,6 +452,7 @@ if __name__ == "__main__":
         filter_type=filter_type, filter_radius=filter_radius,
         save_dir=f'{base_dir}/{pde_type}_{mesh_type}_{optimizer_type}_{filter_type}_p{fem_p}',
         )
+    # config_basic_filter = replace(config_basic_filter, dof_layout=profile_dof_layouts(config_basic_filter))
     result = run_basic_filter_test(config_basic_filter)
     
     '''